@@ -3,14 +3,26 @@ os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 import pygame
 import random
 import math
-
-# Initialize Pygame
-pygame.init()
-
-# Set up the display
+import time
+import struct
+import zlib
+import argparse
+import mmap
+import queue
+import threading
+from collections import deque
+from functools import cached_property
+import numpy as np
+
+# Display size (the window itself is opened by Game.open_window, never at import)
 WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Space Shooter")
+
+def init_pygame(display=True):
+    # Only the subsystems the game uses; pygame.init() would also start audio and joysticks
+    if display and not pygame.display.get_init():
+        pygame.display.init()
+    if not pygame.font.get_init():
+        pygame.font.init()
 
 # Colors
 WHITE = (255, 255, 255)
@@ -30,6 +42,109 @@ HEALTH_RED = (255, 0, 0)
 POWER_YELLOW = (255, 215, 0)
 POWER_RED = (255, 0, 0)
 
+# Sprite cache
+class SpriteCache:
+    """Renders each visual variant of an entity once and reuses the surface."""
+    def __init__(self):
+        self.sprites = {}
+        self.allocations = 0
+
+    def get(self, key, size, render):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface(size, pygame.SRCALPHA)
+            self.allocations += 1
+            render(sprite)
+            # Match the display format when there is one, for faster blits
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert_alpha()
+            self.sprites[key] = sprite
+        return sprite
+
+    def clear(self):
+        self.sprites.clear()
+
+sprites = SpriteCache()
+
+# Collision
+class MaskCache:
+    """Collision masks derived once per sprite variant and reused."""
+    def __init__(self):
+        self.masks = {}
+        self.solid = {}
+
+    def get(self, key, size, render):
+        mask = self.masks.get(key)
+        if mask is None:
+            mask = self.masks[key] = pygame.mask.from_surface(sprites.get(key, size, render))
+        return mask
+
+    def box(self, width, height):
+        size = (max(1, int(width)), max(1, int(height)))
+        mask = self.solid.get(size)
+        if mask is None:
+            mask = self.solid[size] = pygame.mask.Mask(size, fill=True)
+        return mask
+
+masks = MaskCache()
+
+# Boxes are half-open, [x, x + width), everywhere below: boxes that only touch do not collide.
+# Exact mask tests run only after the cheap bounding-box test has passed.
+def collision_mask(entity):
+    # (mask, x, y): the entity's sprite mask if it has one, otherwise its solid bounding box
+    if hasattr(entity, "mask"):
+        return entity.mask()
+    return masks.box(entity.width, entity.height), entity.x, entity.y
+
+def boxes_overlap(ax, ay, aw, ah, bx, by, bw, bh):
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+def box_hits(entity, x, y, width, height):
+    """Whether the box (x, y, width, height) touches an opaque pixel of the entity."""
+    if not boxes_overlap(entity.x, entity.y, entity.width, entity.height, x, y, width, height):
+        return False
+    mask, mx, my = collision_mask(entity)
+    return mask.overlap(masks.box(width, height), (math.floor(x - mx), math.floor(y - my))) is not None
+
+def sweep(box, hit, x0, y0, dx, dy, width, height):
+    """Earliest time in [0, 1] at which a box moving from (x0, y0) by (dx, dy) hits a target, or None."""
+    # `box` bounds the target and `hit(x, y)`, when given, is the exact test
+    bx, by, bw, bh = box
+    # Moving box against the target box grown by the moving box's size: a ray against a box
+    enter, leave = 0.0, 1.0
+    for start, delta, low, high in ((x0, dx, bx - width, bx + bw), (y0, dy, by - height, by + bh)):
+        if delta == 0:
+            if not low < start < high:
+                return None
+            continue
+        a = (low - start) / delta
+        b = (high - start) / delta
+        enter = max(enter, min(a, b))
+        leave = min(leave, max(a, b))
+        if enter >= leave:
+            return None
+    if hit is None:
+        return enter
+    steps = int(math.hypot(dx, dy) * (leave - enter) // max(1, min(width, height))) + 1
+    for k in range(steps):
+        t = enter + (leave - enter) * (k + 0.5) / steps
+        if hit(x0 + dx * t, y0 + dy * t):
+            return t
+    return None
+
+def sweep_hits(entity, x0, y0, dx, dy, width, height):
+    """Earliest time in [0, 1] at which a moving box touches the entity's opaque pixels, or None."""
+    return sweep((entity.x, entity.y, entity.width, entity.height),
+                 lambda x, y: box_hits(entity, x, y, width, height), x0, y0, dx, dy, width, height)
+
+def collides(a, b):
+    """Whether the opaque pixels of two entities overlap."""
+    if not boxes_overlap(a.x, a.y, a.width, a.height, b.x, b.y, b.width, b.height):
+        return False
+    mask_a, ax, ay = collision_mask(a)
+    mask_b, bx, by = collision_mask(b)
+    return mask_a.overlap(mask_b, (math.floor(bx - ax), math.floor(by - ay))) is not None
+
 # Player
 class Player:
     def __init__(self, game):
@@ -62,35 +177,54 @@ class Player:
         self.max_power = 100
         self.god_mode = False  # Add god_mode attribute
 
-    def draw(self):
+    # Margin around the ship in its sprite, leaving room for the shield ring
+    sprite_margin = 8
+
+    def draw(self, surface):
+        shield_color = None
+        if self.shield_active or self.respawn_shield_time > 0 or self.god_mode:
+            shield_color = (0, 0, 255) if self.shield_active else (0, 255, 255)
+        key = ("player", self.penetrating_bullets, self.double_shoot, shield_color)
+        size = (self.width + 2 * self.sprite_margin, self.height + 2 * self.sprite_margin)
+        sprite = sprites.get(key, size, lambda sprite: self.render(sprite, *key[1:]))
+        return surface.blit(sprite, (self.x - self.sprite_margin, self.y - self.sprite_margin))
+
+    def mask(self):
+        # The hull only: the shield ring is drawn in the sprite but is not part of the hitbox
+        key = ("player", False, self.double_shoot, None)
+        size = (self.width + 2 * self.sprite_margin, self.height + 2 * self.sprite_margin)
+        mask = masks.get(key, size, lambda sprite: self.render(sprite, *key[1:]))
+        return mask, self.x - self.sprite_margin, self.y - self.sprite_margin
+
+    def render(self, sprite, penetrating, double_shoot, shield_color):
+        x = y = self.sprite_margin
         # Platform
-        pygame.draw.rect(screen, WHITE, (self.x, self.y + self.height - 10, self.width, 10))
+        pygame.draw.rect(sprite, WHITE, (x, y + self.height - 10, self.width, 10))
         # Main body
-        body_color = YELLOW if self.penetrating_bullets else WHITE
-        pygame.draw.rect(screen, body_color, (self.x + 5, self.y + 20, self.width - 10, self.height - 30))
+        body_color = YELLOW if penetrating else WHITE
+        pygame.draw.rect(sprite, body_color, (x + 5, y + 20, self.width - 10, self.height - 30))
         # Triangle top(s)
-        pygame.draw.polygon(screen, body_color, [
-            (self.x + self.width // 2, self.y),
-            (self.x + 10, self.y + 20),
-            (self.x + self.width - 10, self.y + 20)
+        pygame.draw.polygon(sprite, body_color, [
+            (x + self.width // 2, y),
+            (x + 10, y + 20),
+            (x + self.width - 10, y + 20)
         ])
-        if self.double_shoot:
-            pygame.draw.polygon(screen, body_color, [
-                (self.x + 5, self.y + 10),
-                (self.x + 15, self.y + 25),
-                (self.x + 25, self.y + 10)
+        if double_shoot:
+            pygame.draw.polygon(sprite, body_color, [
+                (x + 5, y + 10),
+                (x + 15, y + 25),
+                (x + 25, y + 10)
             ])
-            pygame.draw.polygon(screen, body_color, [
-                (self.x + self.width - 5, self.y + 10),
-                (self.x + self.width - 15, self.y + 25),
-                (self.x + self.width - 25, self.y + 10)
+            pygame.draw.polygon(sprite, body_color, [
+                (x + self.width - 5, y + 10),
+                (x + self.width - 15, y + 25),
+                (x + self.width - 25, y + 10)
             ])
-        if self.shield_active or self.respawn_shield_time > 0 or self.god_mode:
-            shield_color = (0, 0, 255) if self.shield_active else (0, 255, 255)
-            pygame.draw.circle(screen, shield_color, 
-                               (self.x + self.width // 2, self.y + self.height // 2), 
+        if shield_color:
+            pygame.draw.circle(sprite, shield_color,
+                               (x + self.width // 2, y + self.height // 2),
                                max(self.width, self.height) // 2 + 5, 2)
-                               
+
     def move(self, dx):
         self.x += dx
         self.x = max(0, min(self.x, WIDTH - self.width))
@@ -188,373 +322,958 @@ class Player:
         return False
 
     def collides_with(self, other):
-        return (self.x < other.x + other.width and
-                self.x + self.width > other.x and
-                self.y < other.y + other.height and
-                self.y + self.height > other.y)
-
-# Bullet
-class Bullet:
-    def __init__(self, x, y, penetrating=False):
-        self.x = x
-        self.y = y
-        self.speed = 5
-        self.penetrating = penetrating
-
-    def move(self):
-        self.y -= self.speed
-
-    def draw(self):
-        color = YELLOW if self.penetrating else WHITE
-        pygame.draw.rect(screen, color, (self.x, self.y, 3, 10))
-
-# Enemy
-class Enemy:
-    def __init__(self, x, y, wave, game):
-        self.x = x
-        self.y = y
-        self.width = 30
-        self.height = 30
-        self.move_counter = 0
-        self.move_delay = 40
-        self.step_size = 4
-        self.direction = 1
-        self.shoot_cooldown = random.randint(60, 180)
-        self.color = self.get_color(wave, game.enemy_colors)
-        self.eye_color = self.get_eye_color(wave, game.eye_colors)
-        self.base_speed = 1
-        self.speed_multiplier = 1
-        
-    def get_color(self, wave, colors):
-        color_index = (wave - 1) % len(colors)
-        return colors[color_index]
-
-    def get_eye_color(self, wave, colors):
-        eye_color_index = ((wave - 1) // len(colors)) % len(colors)
-        return colors[eye_color_index]
-
-    def move(self):
-        self.move_counter += self.base_speed * self.speed_multiplier
-        if self.move_counter >= self.move_delay:
-            self.move_counter = 0
-            self.x += self.step_size * self.direction * self.speed_multiplier
-
-    def draw(self):
-        pygame.draw.rect(screen, self.color, (self.x, self.y + 10, self.width, self.height - 10))
-        pygame.draw.polygon(screen, self.color, [
-            (self.x, self.y + 10),
-            (self.x + self.width // 2, self.y),
-            (self.x + self.width, self.y + 10)
-        ])
-        pygame.draw.circle(screen, self.eye_color, (self.x + 7, self.y + 15), 3)
-        pygame.draw.circle(screen, self.eye_color, (self.x + self.width - 7, self.y + 15), 3)
-
-    def can_shoot(self):
-        if self.shoot_cooldown <= 0:
-            self.shoot_cooldown = random.randint(120, 240)  # Reset cooldown
-            return True
-        self.shoot_cooldown -= 1
-        return False
-
-    def shoot(self):
-        if random.random() < 0.2:  # Adjust the probability as needed
-            return EnemyBullet(self.x + self.width // 2, self.y + self.height)
-        return None
-
-class SpecialEnemy:
-    def __init__(self, game):
-        self.game = game
-        self.width = 60
-        self.height = 40
-        self.x = -self.width
-        self.y = 50
-        self.speed = 2
-        self.health = 30
-        self.shoot_cooldown = 0
-        self.movement_pattern = self.generate_movement_pattern()
-        self.current_move = 0
-
-    def take_damage(self, damage):
-        self.health -= damage
-        return self.health <= 0
-
-    def generate_movement_pattern(self):
-        pattern = []
-        current_pos = 0
-        while current_pos < 80:
-            max_target = min(80, current_pos + 50)
-            min_target = max(20, current_pos + 10)
-            if max_target <= min_target:
-                break
-            target = random.randint(min_target, max_target)
-            pattern.append((target, random.randint(30, 90)))  # (target_percent, pause_frames)
-            current_pos = target
-        pattern.append((110, 0))  # Exit screen
-        return pattern
+        return collides(self, other)
+
+# Columnar storage
+class ColumnStore:
+    """NumPy columns sharing one row index, with the live rows packed into [0, count)."""
+    def __init__(self, columns, capacity):
+        # columns are (name, dtype) or (name, dtype, value of unused rows)
+        self.columns = {}
+        self.fills = {}
+        for name, dtype, *fill in columns:
+            self.fills[name] = fill[0] if fill else 0
+            self.set_column(name, np.full(capacity, self.fills[name], dtype))
+        self.count = 0
+
+    def set_column(self, name, array):
+        self.columns[name] = array
+        setattr(self, name, array)
+
+    def __len__(self):
+        return self.count
+
+    def arrays(self):
+        return list(self.columns.values())
+
+    def grow(self, needed=0):
+        # Double the capacity until `needed` rows fit, keeping the live rows
+        capacity = len(next(iter(self.columns.values()))) * 2
+        while capacity < needed:
+            capacity *= 2
+        for name, old in list(self.columns.items()):
+            new = np.full(capacity, self.fills[name], old.dtype)
+            new[:self.count] = old[:self.count]
+            self.set_column(name, new)
+
+    def compact(self, keep):
+        # Keep only the live rows whose entry in the boolean mask is set
+        kept = int(np.count_nonzero(keep))
+        if kept == self.count:
+            return
+        for column in self.columns.values():
+            column[:kept] = column[:self.count][keep]
+        self.count = kept
+
+    def clear(self):
+        self.count = 0
+
+# Projectiles
+class ProjectileStore(ColumnStore):
+    """Struct-of-arrays storage for a list of projectiles."""
+    PENETRATING = 1
+
+    def __init__(self, color, penetrating_color=None, capacity=64):
+        super().__init__((("x", np.float64), ("y", np.float64), ("dx", np.float64), ("dy", np.float64),
+                          ("width", np.int32), ("height", np.int32), ("flags", np.int32)), capacity)
+        self.color = color
+        self.penetrating_color = penetrating_color or color
+
+    def add(self, x, y, dx, dy, width, height, flags=0):
+        if self.count == len(self.x):
+            self.grow()
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.dx[i] = dx
+        self.dy[i] = dy
+        self.width[i] = width
+        self.height[i] = height
+        self.flags[i] = flags
+        self.count += 1
+        return i
+
+    def remove(self, index):
+        # Swap-remove: the last projectile takes the freed slot
+        last = self.count - 1
+        for arr in self.arrays():
+            arr[index] = arr[last]
+        self.count = last
 
     def move(self):
-        if self.current_move >= len(self.movement_pattern):
-            return False
-
-        target_percent, pause = self.movement_pattern[self.current_move]
-        target_x = (WIDTH * target_percent // 100) - self.width // 2
+        n = self.count
+        if not n:
+            return
+        self.x[:n] += self.dx[:n]
+        self.y[:n] += self.dy[:n]
 
-        if pause > 0:
-            self.movement_pattern[self.current_move] = (target_percent, pause - 1)
-        elif abs(self.x - target_x) > self.speed:
-            self.x += self.speed if target_x > self.x else -self.speed
+    def cull(self, min_x=-math.inf, min_y=-math.inf, max_x=math.inf, max_y=math.inf):
+        n = self.count
+        if not n:
+            return
+        x = self.x[:n]
+        y = self.y[:n]
+        self.compact((x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y))
+
+    def overlapping_rect(self, x, y, width, height):
+        # Mask of projectiles whose bounding box overlaps the rect
+        n = self.count
+        px = self.x[:n]
+        py = self.y[:n]
+        return ((x < px + self.width[:n]) & (x + width > px) &
+                (y < py + self.height[:n]) & (y + height > py))
+
+    def start(self, i):
+        # (x, y, dx, dy, width, height) of projectile i at the start of this tick's move
+        dx, dy = float(self.dx[i]), float(self.dy[i])
+        return float(self.x[i]) - dx, float(self.y[i]) - dy, dx, dy, int(self.width[i]), int(self.height[i])
+
+    def swept_rect(self, x, y, width, height):
+        # Mask of projectiles whose box crossed the rect at any point of this tick's move
+        n = self.count
+        entered = np.zeros(n)
+        left = np.ones(n)
+        for position, delta, size, low, high in ((self.x[:n], self.dx[:n], self.width[:n], x, x + width),
+                                                 (self.y[:n], self.dy[:n], self.height[:n], y, y + height)):
+            start = position - delta
+            inside = (start > low - size) & (start < high)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                a = (low - size - start) / delta
+                b = (high - start) / delta
+            still = delta == 0
+            entered = np.maximum(entered, np.where(still, np.where(inside, 0.0, np.inf), np.minimum(a, b)))
+            left = np.minimum(left, np.where(still, np.where(inside, 1.0, -np.inf), np.maximum(a, b)))
+        return entered < left
+
+    def hitting(self, entity):
+        # Mask of projectiles that touched an opaque pixel of the entity during this tick's move
+        hits = self.swept_rect(entity.x, entity.y, entity.width, entity.height)
+        for i in np.flatnonzero(hits).tolist():
+            hits[i] = sweep_hits(entity, *self.start(i)) is not None
+        return hits
+
+    def draw(self, surface):
+        n = self.count
+        rects = []
+        for x, y, w, h, flags in zip(self.x[:n].tolist(), self.y[:n].tolist(),
+                                     self.width[:n].tolist(), self.height[:n].tolist(),
+                                     self.flags[:n].tolist()):
+            color = self.penetrating_color if flags & self.PENETRATING else self.color
+            rects.append(surface.fill(color, (int(x), int(y), w, h)))
+        return rects
+
+# Broadphase
+class SpatialGrid:
+    """Uniform grid that buckets entities by the cells their bounding box covers."""
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.bounds = None  # (min_x, min_y, max_x, max_y) of everything inserted
+
+    def clear(self):
+        self.cells.clear()
+        self.bounds = None
+
+    def insert(self, obj, x, y, width, height):
+        if self.bounds is None:
+            self.bounds = (x, y, x + width, y + height)
         else:
-            self.current_move += 1
+            min_x, min_y, max_x, max_y = self.bounds
+            self.bounds = (min(min_x, x), min(min_y, y), max(max_x, x + width), max(max_y, y + height))
+        size = self.cell_size
+        for cx in range(int(x // size), int((x + width) // size) + 1):
+            for cy in range(int(y // size), int((y + height) // size) + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is None:
+                    self.cells[(cx, cy)] = [obj]
+                else:
+                    cell.append(obj)
+
+    def candidates(self, store):
+        # Indices of the projectiles in a ProjectileStore that could touch anything in the grid
+        if self.bounds is None:
+            return []
+        min_x, min_y, max_x, max_y = self.bounds
+        return np.flatnonzero(store.swept_rect(min_x, min_y, max_x - min_x, max_y - min_y)).tolist()
+
+    def query_point(self, x, y):
+        size = self.cell_size
+        return self.cells.get((int(x // size), int(y // size)), ())
+
+    def query_rect(self, x, y, width, height):
+        # Objects spanning several cells are reported once, in insertion order
+        size = self.cell_size
+        x0, x1 = int(x // size), int((x + width) // size)
+        y0, y1 = int(y // size), int((y + height) // size)
+        if x0 == x1 and y0 == y1:
+            return self.cells.get((x0, y0), ())
+        found = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                found.update(dict.fromkeys(self.cells.get((cx, cy), ())))
+        return list(found)
 
-        return self.x < WIDTH + self.width
+# Bullet
+class Bullet:
+    speed = 5
+    width = 3
+    height = 10
 
-    def shoot(self):
-        if self.shoot_cooldown == 0:
-            self.shoot_cooldown = random.randint(90, 150)  # Shoot every 1.5 to 2.5 seconds
-            angle = math.atan2(self.game.player.y - self.y, self.game.player.x - self.x)
-            return [EnemyBullet(self.x + self.width // 2, self.y + self.height,
-                                math.cos(angle) * 3, math.sin(angle) * 3)]
-        self.shoot_cooldown = max(0, self.shoot_cooldown - 1)
-        return []
-
-    def draw(self):
-        pygame.draw.ellipse(screen, (150, 150, 150), (self.x, self.y + self.height // 2, self.width, self.height // 2))
-        pygame.draw.arc(screen, (200, 200, 200), (self.x, self.y, self.width, self.height), math.pi, 2 * math.pi, 5)
-        for i in range(3):
-            x = self.x + (i + 1) * self.width // 4
-            y = self.y + self.height // 2
-            pygame.draw.circle(screen, (255, 255, 0), (x, y), 5)
+    @classmethod
+    def spawn(cls, store, x, y, penetrating=False):
+        store.add(x, y, 0, -cls.speed, cls.width, cls.height,
+                  ProjectileStore.PENETRATING if penetrating else 0)
 
 class EnemyBullet:
-    def __init__(self, x, y, dx=0, dy=2):
-        self.x = x
-        self.y = y
-        self.speed_x = dx
-        self.speed_y = dy
-        self.width = 6
-        self.height = 15
-
-    def move(self):
-        self.x += self.speed_x
-        self.y += self.speed_y
+    width = 6
+    height = 15
 
-    def draw(self):
-        pygame.draw.rect(screen, (255, 0, 0), (self.x, self.y, self.width, self.height))
+    @classmethod
+    def spawn(cls, store, x, y, dx=0, dy=2):
+        store.add(x, y, dx, dy, cls.width, cls.height)
 
-# Power-up
-class PowerUp:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.speed = 1
-        self.type = random.choice(["double_shoot", "penetrating", "shield"])
-
-    def move(self):
-        self.y += self.speed
+class FlockEnemyBullet:
+    width = 6
+    height = 6
+
+    @classmethod
+    def spawn(cls, store, x, y, dx, dy):
+        store.add(x, y, dx, dy, cls.width, cls.height)
+
+# Entity-component system
+class Archetype(ColumnStore):
+    """Columnar storage for the entities that have exactly one set of components."""
+    def __init__(self, components, capacity=16):
+        self.components = components
+        self.fields = [field for component in sorted(components) for field in World.COMPONENTS[component]]
+        super().__init__(self.fields + [("entity", np.int64)], capacity)
+        # Moving boxes are swept against the circle in the box, the whole box or the sprite's opaque pixels
+        self.sweep = sweep_round if "round" in components else sweep_box if "solid" in components else sweep_sprite
+
+    def __getitem__(self, name):
+        return self.columns[name][:self.count]
+
+    def arrays(self):
+        # The field columns, in the archetype's fixed order
+        return [self.columns[name] for name, _ in self.fields]
+
+
+class World:
+    """Entities as integer ids, with their components stored in archetype tables."""
+    # Component -> its fields; components without fields are tags
+    COMPONENTS = {
+        "position": (("x", np.float64), ("y", np.float64)),
+        "velocity": (("dx", np.float64), ("dy", np.float64)),
+        "size": (("width", np.int32), ("height", np.int32)),
+        "sprite": (("sprite", np.int32),),  # Index into World.SPRITES
+        "pickup": (("effect", np.int32),),  # Collected by the player on contact
+        "solid": (),  # Collides as its whole box rather than its sprite's opaque pixels
+        "round": (),  # Collides as the circle inscribed in its box
+        "lands": (("ground", np.float64), ("stay", np.int32)),  # Stops at the ground and lasts `stay` ticks there
+        "lifetime": (("ticks", np.int32),),  # Destroyed when this counts down to zero
+        "culled": (),  # Destroyed once it falls below the screen
+        "health": (("health", np.int32),),  # Hits from the player's bullets it takes to destroy
+        "armored": (),  # Stops penetrating bullets too
+        "flinches": (),  # Takes at most one hit per tick
+        "bounty": (("points", np.int32),),  # Score for destroying it
+        "debris": (("explosion", np.int32),),  # Index into World.EXPLOSIONS, burst from its center when destroyed
+        # Pickup effect dropped when destroyed (-1 for a random power-up), at `drop_y` of its height
+        "loot": (("drop_chance", np.float64), ("drop", np.int32), ("drop_y", np.float64)),
+        "wreck": (("wreck_sprite", np.int32),),  # Destroyed, it stays behind with this sprite and no health
+        "wave": (),  # The wave is over once none are left
+        "invader": (),  # Costs a life if it marches down to the player
+        # Follows the anchor entity at this offset, and is destroyed with it
+        "attached": (("anchor", np.int64), ("local_x", np.float64), ("local_y", np.float64)),
+        # Steps sideways and down as a formation spanning everything attached to it
+        "march": (("move_counter", np.float64), ("move_delay", np.float64), ("step_size", np.float64),
+                  ("direction", np.int32), ("base_speed", np.float64), ("multiplier", np.float64),
+                  ("sped_up", np.bool_)),
+        "bounce": (("left", np.float64), ("right", np.float64)),  # Turns around when x leaves [left, right]
+        # Waits `pause` ticks, then flies to `goal` percent of the screen width and picks the next goal
+        "patrol": (("goal", np.int32), ("pause", np.int32), ("speed", np.float64)),
+        "home": (("home_x", np.float64), ("home_y", np.float64), ("home_dx", np.float64)),  # Returned to after a dive
+        "flock": (),  # Launched into dives by the bonus wave
+        "diving": (),  # Out of its flock, flying down at the player
+        "rams": (("ram_damage", np.int32),),  # Hurts the player on contact, then goes home
+        # Gains this health and sprite once nothing attached to it has health left
+        "core": (("core_health", np.int32), ("core_sprite", np.int32)),
+        # Fired by shooting_system; built with gun()
+        "gun": (("cooldown", np.int32), ("reload_min", np.int32), ("reload_max", np.int32), ("chance", np.float64),
+                ("cap", np.int32), ("aimed", np.bool_), ("spread", np.float64), ("speed_min", np.float64),
+                ("speed_max", np.float64), ("muzzle_x", np.float64), ("muzzle_y", np.float64),
+                ("shot_width", np.int32), ("shot_height", np.int32), ("store", np.int32)),
+    }
+    # (key, size, render) per sprite index, shared by every world; size may be a function evaluated on first use
+    SPRITES = []
+    SPRITE_KEYS = {}
+    # ((color, count, speed, life), ...) particle bursts per explosion index
+    EXPLOSIONS = []
+    EXPLOSION_KEYS = {}
+
+    @classmethod
+    def sprite(cls, key, size, render):
+        index = cls.SPRITE_KEYS.get(key)
+        if index is None:
+            index = cls.SPRITE_KEYS[key] = len(cls.SPRITES)
+            cls.SPRITES.append((key, size, render))
+        return index
+
+    @classmethod
+    def explosion(cls, bursts):
+        index = cls.EXPLOSION_KEYS.get(bursts)
+        if index is None:
+            index = cls.EXPLOSION_KEYS[bursts] = len(cls.EXPLOSIONS)
+            cls.EXPLOSIONS.append(bursts)
+        return index
 
-    def draw(self):
-        if self.type == "double_shoot":
-            pygame.draw.polygon(screen, GREEN, [
-                (self.x, self.y), (self.x + 10, self.y + 20), (self.x + 20, self.y)
+    def __init__(self):
+        self.archetypes = {}
+        self.matches = {}  # Queried components -> archetypes that have them, until a new archetype appears
+        self.locations = {}  # Entity -> (archetype, row)
+        self.next_entity = 0
+
+    def __len__(self):
+        return len(self.locations)
+
+    def archetype(self, components):
+        components = frozenset(components)
+        archetype = self.archetypes.get(components)
+        if archetype is None:
+            archetype = self.archetypes[components] = Archetype(components)
+            self.matches.clear()
+        return archetype
+
+    def query(self, *components):
+        # Non-empty archetypes that have all of the components
+        if not self.locations:
+            return []
+        matches = self.matches.get(components)
+        if matches is None:
+            wanted = frozenset(components)
+            # Ordered by component names, not creation, so every world (a restored one too) runs systems alike
+            matches = self.matches[components] = sorted(
+                (archetype for key, archetype in self.archetypes.items() if wanted <= key),
+                key=lambda archetype: sorted(archetype.components))
+        return [archetype for archetype in matches if archetype.count]
+
+    def count(self, *components):
+        return sum(len(archetype) for archetype in self.query(*components))
+
+    def extend(self, components, count, entities=None):
+        """Add `count` entities with the components, given ids or new ones; returns (archetype, first row)."""
+        archetype = self.archetype(components)
+        start = archetype.count
+        if start + count > len(archetype.columns["entity"]):
+            archetype.grow(start + count)
+        if entities is None:
+            entities = np.arange(self.next_entity, self.next_entity + count)
+        added = archetype.columns["entity"][start:start + count]
+        added[:] = entities
+        for row, entity in enumerate(added.tolist(), start):
+            self.locations[entity] = (archetype, row)
+            self.next_entity = max(self.next_entity, entity + 1)
+        archetype.count += count
+        return archetype, start
+
+    def spawn(self, **components):
+        """Add one entity from component values, e.g. spawn(position=(x, y), culled=()); returns its id."""
+        entity = self.next_entity
+        self.next_entity += 1
+        self.insert(entity, components)
+        return entity
+
+    def insert(self, entity, components):
+        archetype = self.archetype(components)
+        row = archetype.count
+        if row == len(archetype.columns["entity"]):
+            archetype.grow(row + 1)
+        archetype.columns["entity"][row] = entity
+        for component, values in components.items():
+            for (name, _), value in zip(self.COMPONENTS[component], values):
+                archetype.columns[name][row] = value
+        archetype.count += 1
+        self.locations[entity] = (archetype, row)
+
+    def components(self, entity):
+        archetype, row = self.locations[entity]
+        return {component: tuple(archetype.columns[name][row].item() for name, _ in self.COMPONENTS[component])
+                for component in archetype.components}
+
+    def change(self, entity, add=None, remove=()):
+        """Add and remove components; the entity keeps its id but moves to another archetype."""
+        components = self.components(entity)
+        for component in remove:
+            components.pop(component, None)
+        components.update(add or {})
+        self.destroy(entity)
+        self.insert(entity, components)
+
+    def destroy(self, entity):
+        archetype, row = self.locations.pop(entity)
+        # The later rows shift up, so an archetype keeps its entities in the order they were added
+        last = archetype.count - 1
+        if row != last:
+            for column in archetype.columns.values():
+                column[row:last] = column[row + 1:last + 1]
+            for moved, entity in enumerate(archetype.columns["entity"][row:last].tolist(), row):
+                self.locations[entity] = (archetype, moved)
+        archetype.count = last
+
+    def destroy_where(self, archetype, doomed):
+        # Destroy the archetype's entities whose entry in the boolean mask is set
+        if not doomed.any():
+            return
+        for entity in archetype["entity"][doomed].tolist():
+            del self.locations[entity]
+        archetype.compact(~doomed)
+        for row, entity in enumerate(archetype["entity"].tolist()):
+            self.locations[entity] = (archetype, row)
+
+    def clear(self):
+        for archetype in self.archetypes.values():
+            archetype.count = 0
+        self.locations.clear()
+
+    @classmethod
+    def surface(cls, index):
+        key, size, render = cls.SPRITES[index]
+        return sprites.get(key, size() if callable(size) else size, render)
+
+    @classmethod
+    def mask(cls, index):
+        key, size, render = cls.SPRITES[index]
+        return masks.get(key, size() if callable(size) else size, render)
+
+# Systems: each runs over every archetype that has the components it needs
+def movement_system(world):
+    for archetype in world.query("position", "velocity"):
+        x, y = archetype["x"], archetype["y"]
+        x += archetype["dx"]
+        y += archetype["dy"]
+
+def bounce_system(world):
+    for archetype in world.query("position", "velocity", "bounce"):
+        x, dx = archetype["x"], archetype["dx"]
+        dx[(x < archetype["left"]) | (x > archetype["right"])] *= -1
+
+def march_system(world, config):
+    # Each formation steps as one body, turning at the screen edges by the extent of its remaining members
+    members = [(archetype["anchor"], archetype["local_x"], archetype["local_y"], archetype["width"],
+                archetype["height"]) for archetype in world.query("attached", "size")]
+    if not members:
+        return
+    anchors, local_x, local_y, width, height = (np.concatenate(column) for column in zip(*members))
+    for archetype in world.query("position", "march"):
+        x, y = archetype["x"], archetype["y"]
+        counter, direction, multiplier, sped_up = (archetype["move_counter"], archetype["direction"],
+                                                   archetype["multiplier"], archetype["sped_up"])
+        for row, entity in enumerate(archetype["entity"].tolist()):
+            mine = anchors == entity
+            count = int(np.count_nonzero(mine))
+            if not count:
+                continue
+            step = int(height[mine].max())
+            left = x[row] + local_x[mine].min()
+            right = x[row] + (local_x[mine] + width[mine]).max()
+            bottom = y[row] + (local_y[mine] + height[mine]).max()
+            if count == 1 and not sped_up[row]:
+                multiplier[row] = config["enemy_speed_multiplier_last"]
+                sped_up[row] = True
+            elif bottom - step >= HEIGHT - 4 * step and not sped_up[row]:
+                multiplier[row] = config["enemy_speed_multiplier_group"]
+                sped_up[row] = True
+
+            if (right >= WIDTH and direction[row] == 1) or (left <= 0 and direction[row] == -1):
+                direction[row] *= -1
+                y[row] += step
+                counter[row] = 0
+            else:
+                counter[row] += archetype["base_speed"][row] * multiplier[row]
+                if counter[row] >= archetype["move_delay"][row]:
+                    counter[row] = 0
+                    x[row] += archetype["step_size"][row] * direction[row] * multiplier[row]
+
+def attachment_system(world):
+    for archetype in world.query("position", "attached"):
+        anchors = archetype["anchor"]
+        for anchor in np.unique(anchors).tolist():
+            owner, row = world.locations[anchor]
+            mine = anchors == anchor
+            archetype["x"][mine] = owner["x"][row] + archetype["local_x"][mine]
+            archetype["y"][mine] = owner["y"][row] + archetype["local_y"][mine]
+
+PATROL_EXIT = 110  # Patrol goal off the right edge of the screen, which ends the patrol
+
+def next_goal(rng, goal):
+    # (goal, pause) after `goal`: stops 10-50% further right within 20-80% of the width, then the exit
+    low, high = max(20, goal + 10), min(80, goal + 50)
+    if goal >= 80 or high <= low:
+        return PATROL_EXIT, 0
+    return rng.randint(low, high), rng.randint(30, 90)
+
+def patrol_system(world, rng):
+    for archetype in world.query("position", "size", "patrol"):
+        x, goal, pause, speed = archetype["x"], archetype["goal"], archetype["pause"], archetype["speed"]
+        finished = []
+        for row, entity in enumerate(archetype["entity"].tolist()):
+            target = WIDTH * goal[row] // 100 - archetype["width"][row] // 2
+            if pause[row] > 0:
+                pause[row] -= 1
+            elif abs(x[row] - target) > speed[row]:
+                x[row] += speed[row] if target > x[row] else -speed[row]
+            elif goal[row] == PATROL_EXIT:
+                finished.append(entity)
+            else:
+                goal[row], pause[row] = next_goal(rng, int(goal[row]))
+        for entity in finished:
+            world.destroy(entity)
+
+def return_home(world, entity):
+    archetype, row = world.locations[entity]
+    world.change(entity, add={"position": (archetype["home_x"][row], archetype["home_y"][row]),
+                              "velocity": (archetype["home_dx"][row], 0)}, remove=("diving", "rams"))
+
+def dive_system(world, bottom):
+    # Divers that fall past the bottom go back to their place
+    for archetype in world.query("position", "home", "diving"):
+        for entity in archetype["entity"][archetype["y"] > bottom].tolist():
+            return_home(world, entity)
+
+def shooting_system(world, rng, target, stores, *components, store=None):
+    """Fire the ready guns of entities that also have `components`, into stores[gun store] or `store`."""
+    # Ready guns fire one at a time, archetype by archetype and row by row, so they draw from the RNG in order
+    names = [name for name, _ in World.COMPONENTS["gun"]][1:]
+    for archetype in world.query("position", "gun", *components):
+        cooldown = archetype["cooldown"]
+        ready = cooldown <= 0
+        cooldown[~ready] -= 1
+        for row in np.flatnonzero(ready).tolist():
+            (reload_min, reload_max, chance, cap, aimed, spread, speed_min, speed_max, muzzle_x, muzzle_y,
+             shot_width, shot_height, index) = (archetype[name][row].item() for name in names)
+            if reload_max:
+                cooldown[row] = rng.randint(reload_min, reload_max)
+            out = stores[index] if store is None else store
+            if cap and len(out) >= cap:
+                continue
+            if chance < 1 and not rng.random() < chance:
+                continue
+            x, y = archetype["x"][row].item(), archetype["y"][row].item()
+            if aimed:
+                angle = math.atan2(target.y - y, target.x - x)
+                if spread:
+                    angle += rng.uniform(-spread, spread)
+            speed = rng.uniform(speed_min, speed_max) if speed_max > speed_min else speed_min
+            dx, dy = (math.cos(angle) * speed, math.sin(angle) * speed) if aimed else (0, speed)
+            out.add(x + muzzle_x, y + muzzle_y, dx, dy, shot_width, shot_height)
+
+def exposure_system(world):
+    # Cores become targets once nothing attached to them has health left
+    cores = [(entity, health, sprite) for archetype in world.query("core")
+             for entity, health, sprite in zip(archetype["entity"].tolist(), archetype["core_health"].tolist(),
+                                               archetype["core_sprite"].tolist())]
+    for entity, health, sprite in cores:
+        if not any((archetype["anchor"] == entity).any() for archetype in world.query("attached", "health")):
+            world.change(entity, add={"health": (health,), "sprite": (sprite,)}, remove=("core",))
+
+def landing_system(world):
+    # Entities that fall to their ground stop there and start counting down their stay
+    for archetype in world.query("position", "lands"):
+        y, ground = archetype["y"], archetype["ground"]
+        landed = np.flatnonzero(y >= ground)
+        if not len(landed):
+            continue
+        y[landed] = ground[landed]
+        # Rows move as entities change archetype, so collect them before changing any
+        for entity, stay in zip(archetype["entity"][landed].tolist(), archetype["stay"][landed].tolist()):
+            world.change(entity, add={"lifetime": (stay,)}, remove=("lands", "velocity"))
+
+def lifetime_system(world):
+    for archetype in world.query("lifetime"):
+        ticks = archetype["ticks"]
+        ticks -= 1
+        world.destroy_where(archetype, ticks <= 0)
+
+def cull_system(world, bottom):
+    for archetype in world.query("position", "culled"):
+        world.destroy_where(archetype, archetype["y"] > bottom)
+
+def contact_system(world, player, *components):
+    """(archetype, row) of every entity with the components touching the player: a vectorized box test, then masks."""
+    player_mask, player_x, player_y = collision_mask(player)
+    hits = []
+    for archetype in world.query("position", "size", "sprite", *components):
+        x, y, width, height = archetype["x"], archetype["y"], archetype["width"], archetype["height"]
+        near = ((x < player.x + player.width) & (player.x < x + width) &
+                (y < player.y + player.height) & (player.y < y + height))
+        solid = "solid" in archetype.components
+        for row in np.flatnonzero(near).tolist():
+            mask = masks.box(width[row], height[row]) if solid else World.mask(archetype["sprite"][row])
+            offset = (math.floor(x[row] - player_x), math.floor(y[row] - player_y))
+            if player_mask.overlap(mask, offset) is not None:
+                hits.append((archetype, row))
+    return hits
+
+def pickup_system(world, player):
+    # (entity, effect) of every pickup touching the player
+    return [(int(archetype["entity"][row]), int(archetype["effect"][row]))
+            for archetype, row in contact_system(world, player, "pickup")]
+
+def ram_system(world, player):
+    # (entity, damage) of every rammer touching the player
+    return [(int(archetype["entity"][row]), int(archetype["ram_damage"][row]))
+            for archetype, row in contact_system(world, player, "rams")]
+
+def render_system(world, surface):
+    rects = []
+    for archetype in world.query("position", "sprite"):
+        images = [World.surface(index) for index in archetype["sprite"].tolist()]
+        rects.extend(surface.blits(list(zip(images, zip(archetype["x"].tolist(), archetype["y"].tolist())))))
+    return rects
+
+# Sweeps of a moving box against entity `row` of an archetype, by the archetype's collision shape
+def entity_box(archetype, row):
+    return (archetype["x"][row].item(), archetype["y"][row].item(),
+            archetype["width"][row].item(), archetype["height"][row].item())
+
+def sweep_box(archetype, row, x0, y0, dx, dy, width, height):
+    return sweep(entity_box(archetype, row), None, x0, y0, dx, dy, width, height)
+
+def sweep_round(archetype, row, x0, y0, dx, dy, width, height):
+    box = entity_box(archetype, row)
+    radius = box[2] / 2
+    center_x, center_y = box[0] + radius, box[1] + radius
+    def touches(x, y):
+        # Distance from the circle's center to the nearest point of the box
+        near_x = min(max(center_x, x), x + width)
+        near_y = min(max(center_y, y), y + height)
+        return (near_x - center_x) ** 2 + (near_y - center_y) ** 2 < radius ** 2
+    return sweep(box, touches, x0, y0, dx, dy, width, height)
+
+def sweep_sprite(archetype, row, x0, y0, dx, dy, width, height):
+    box = entity_box(archetype, row)
+    mask = World.mask(archetype["sprite"][row])
+    def touches(x, y):
+        return (boxes_overlap(*box, x, y, width, height) and
+                mask.overlap(masks.box(width, height), (math.floor(x - box[0]), math.floor(y - box[1]))) is not None)
+    return sweep(box, touches, x0, y0, dx, dy, width, height)
+
+# Power-ups
+def render_powerup(kind):
+    def render(sprite):
+        if kind == "double_shoot":
+            pygame.draw.polygon(sprite, GREEN, [
+                (0, 0), (10, 20), (20, 0)
             ])
-        elif self.type == "penetrating":
-            pygame.draw.rect(screen, YELLOW, (self.x, self.y, 20, 20))
+        elif kind == "penetrating":
+            pygame.draw.rect(sprite, YELLOW, (0, 0, 20, 20))
         else:  # shield
-            pygame.draw.circle(screen, BLUE, (self.x + 10, self.y + 10), 10, 2)
+            pygame.draw.circle(sprite, BLUE, (10, 10), 10, 2)
+    return render
 
-    def update(self):
-        self.move()
-        
-# Explosion
-class Explosion:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.size = 1
-        self.max_size = 20
-        self.growth_speed = 0.5
+class PowerUp:
+    """A falling power-up. Power-ups are entities in the game's World; this class only spawns them."""
+    TYPES = ("double_shoot", "penetrating", "shield")
+    speed = 1
+    width = 20
+    height = 20
+    SPRITES = tuple(World.sprite(("powerup", kind), (21, 21), render_powerup(kind)) for kind in TYPES)
+
+    @classmethod
+    def spawn(cls, world, x, y, kind):
+        effect = cls.TYPES.index(kind)
+        return world.spawn(position=(x, y), velocity=(0, cls.speed), size=(cls.width, cls.height),
+                           sprite=(cls.SPRITES[effect],), pickup=(effect,), culled=())
+
+def extra_life_font():
+    init_pygame(display=False)
+    return pygame.font.Font(None, 36)
+
+def extra_life_size():
+    text_width, text_height = extra_life_font().size("1UP")
+    return max(ExtraLifePowerUp.width, text_width), max(ExtraLifePowerUp.height, text_height)
+
+def render_extra_life(collected):
+    def render(sprite):
+        font = extra_life_font()
+        if not collected:
+            pygame.draw.rect(sprite, (0, 255, 0), (0, 0, ExtraLifePowerUp.width, ExtraLifePowerUp.height))
+            text = font.render("1UP", True, (255, 255, 255))
+        else:
+            text = font.render("1UP", True, (0, 255, 0))
+        sprite.blit(text, (0, 0))
+    return render
+
+class ExtraLifePowerUp:
+    """A 1UP dropped by the special enemy: it falls to the ground and waits there for a while."""
+    EFFECT = len(PowerUp.TYPES)  # Pickup effects after the power-up types
+    speed = 2
+    width = 20
+    height = 20
+    ground_level = HEIGHT - 40
+    lifetime = 5 * 60  # Ticks it stays on the ground (5 seconds at 60 FPS)
+    float_time = 61  # Ticks the collected label rises for
+    SPRITES = tuple(World.sprite(("extra_life", collected), extra_life_size, render_extra_life(collected))
+                    for collected in (False, True))
+
+    @classmethod
+    def spawn(cls, world, x, y):
+        return world.spawn(position=(x, y), velocity=(0, cls.speed), size=(cls.width, cls.height),
+                           sprite=(cls.SPRITES[False],), pickup=(cls.EFFECT,), solid=(),
+                           lands=(cls.ground_level, cls.lifetime))
+
+    @classmethod
+    def collect(cls, world, entity):
+        world.change(entity, add={"velocity": (0, -1), "sprite": (cls.SPRITES[True],), "lifetime": (cls.float_time,)},
+                     remove=("pickup", "lands"))
+
+# Particles
+class ParticleSystem(ColumnStore):
+    """Struct-of-arrays particle engine for explosions and hit effects."""
+    FADE_LEVELS = 4
+    SIZE = 4
+    DRAG = 0.94
+
+    def __init__(self, seed=None, capacity=256):
+        super().__init__((("x", np.float64), ("y", np.float64), ("dx", np.float64), ("dy", np.float64),
+                          ("age", np.int32), ("life", np.int32, 1), ("tint", np.int32)), capacity)
+        self.rng = np.random.default_rng(seed)  # Particles are purely visual and never shift the game's RNG
+        self.palette = []  # Colors, indexed by tint
+        self.tints = {}
+        self.frames = []  # FADE_LEVELS sprites per tint, from opaque to faint
+
+    def tint_index(self, color):
+        index = self.tints.get(color)
+        if index is None:
+            index = self.tints[color] = len(self.palette)
+            self.palette.append(color)
+        return index
+
+    def burst(self, x, y, color, count=24, speed=3.0, life=30):
+        # Spray `count` particles outward from (x, y) in random directions and speeds
+        start = self.count
+        end = start + count
+        if end > len(self.x):
+            self.grow(end)
+        angle = self.rng.uniform(0.0, 2 * math.pi, count)
+        velocity = self.rng.uniform(0.2, 1.0, count) * speed
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.dx[start:end] = np.cos(angle) * velocity
+        self.dy[start:end] = np.sin(angle) * velocity
+        self.age[start:end] = 0
+        self.life[start:end] = self.rng.integers(life // 2, life + 1, count)
+        self.tint[start:end] = self.tint_index(color)
+        self.count = end
 
     def update(self):
-        self.size += self.growth_speed
+        n = self.count
+        if not n:
+            return
+        self.x[:n] += self.dx[:n]
+        self.y[:n] += self.dy[:n]
+        self.dx[:n] *= self.DRAG
+        self.dy[:n] *= self.DRAG
+        self.age[:n] += 1
+        self.compact(self.age[:n] < self.life[:n])
+
+    def render(self, color, alpha):
+        def render(sprite):
+            radius = self.SIZE // 2
+            pygame.draw.circle(sprite, color + (alpha,), (radius, radius), radius)
+        return render
+
+    def draw(self, surface):
+        n = self.count
+        if not n:
+            return []
+        while len(self.frames) < len(self.palette):
+            color = self.palette[len(self.frames)]
+            self.frames.append([
+                sprites.get(("particle", color, level), (self.SIZE, self.SIZE),
+                            self.render(color, 255 * (self.FADE_LEVELS - level) // self.FADE_LEVELS))
+                for level in range(self.FADE_LEVELS)])
+        flat = [sprite for frames in self.frames for sprite in frames]
+        level = self.age[:n] * self.FADE_LEVELS // self.life[:n]
+        index = (self.tint[:n] * self.FADE_LEVELS + level).tolist()
+        half = self.SIZE // 2
+        xs = (self.x[:n] - half).astype(np.int32).tolist()
+        ys = (self.y[:n] - half).astype(np.int32).tolist()
+        return surface.blits([(flat[i], (x, y)) for i, x, y in zip(index, xs, ys)])
+
+# Enemies
+def gun(cooldown, reload=(0, 0), chance=1.0, cap=0, aimed=False, spread=0.0, speed=(2.0, 2.0), muzzle=(0, 0),
+        shot=(EnemyBullet.width, EnemyBullet.height), store=0):
+    """Values of a "gun" component, in its field order."""
+    # It fires once `cooldown` runs out, then reloads for randint(*reload) ticks. A shot is skipped while the store
+    # holds `cap` bullets, or with probability 1 - `chance`. Aimed shots head for the player, off by up to `spread`
+    # radians; the others fall straight down. `store` is 0 for the enemy bullets and 1 for the flock's.
+    return (cooldown, *reload, chance, cap, aimed, spread, *speed, *muzzle, *shot, store)
+
+def render_fill(color):
+    return lambda sprite: sprite.fill(color)
+
+def render_disc(color, radius):
+    return lambda sprite: pygame.draw.circle(sprite, color, (radius, radius), radius)
+
+def render_enemy(color, eye_color):
+    def render(sprite):
+        width, height = Enemy.width, Enemy.height
+        pygame.draw.rect(sprite, color, (0, 10, width, height - 10))
+        pygame.draw.polygon(sprite, color, [
+            (0, 10),
+            (width // 2, 0),
+            (width, 10)
+        ])
+        pygame.draw.circle(sprite, eye_color, (7, 15), 3)
+        pygame.draw.circle(sprite, eye_color, (width - 7, 15), 3)
+    return render
 
-    def draw(self):
-        pygame.draw.circle(screen, RED, (self.x, self.y), int(self.size), 1)
+class Enemy:
+    """The enemies of regular and bonus waves. They are entities in the game's World; this class only spawns them."""
+    width = 30
+    height = 30
 
-class ExtraLifePowerUp:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.speed = 2
-        self.width = 20
-        self.height = 20
-        self.lifetime = 5 * 60  # 5 seconds at 60 FPS
-        self.collected = False
-        self.collection_time = 0
-        self.ground_level = HEIGHT - 40  # Adjust this value as needed
+    @staticmethod
+    def get_color(wave, colors):
+        color_index = (wave - 1) % len(colors)
+        return colors[color_index]
 
-    def move(self):
-        if self.y < self.ground_level:
-            self.y += self.speed
-        else:
-            self.y = self.ground_level
+    @staticmethod
+    def get_eye_color(wave, colors):
+        eye_color_index = ((wave - 1) // len(colors)) % len(colors)
+        return colors[eye_color_index]
 
-    def draw(self):
-        if not self.collected:
-            pygame.draw.rect(screen, (0, 255, 0), (self.x, self.y, self.width, self.height))
-            text = game.font.render("1UP", True, (255, 255, 255))
-            screen.blit(text, (self.x, self.y))
-        else:
-            text = game.font.render("1UP", True, (0, 255, 0))
-            screen.blit(text, (self.x, self.y - self.collection_time))
+    @classmethod
+    def spawn(cls, game, x, y, particles=24, **components):
+        # The look, score and explosion of every enemy; the caller adds how it moves, shoots and takes hits
+        color = cls.get_color(game.wave, game.enemy_colors)
+        eye_color = cls.get_eye_color(game.wave, game.eye_colors)
+        # An enemy's look depends only on its colors, so all of a wave shares one sprite
+        sprite = World.sprite(("enemy", color, eye_color), (cls.width + 1, cls.height + 1),
+                              render_enemy(color, eye_color))
+        return game.world.spawn(position=(x, y), size=(cls.width, cls.height), sprite=(sprite,), bounty=(10,),
+                                debris=(World.explosion(((color, particles, 3.0, 30),)),), wave=(), **components)
+
+class Formation:
+    """The marching grid of a regular wave: an anchor entity that its members are attached to."""
+
+    @classmethod
+    def spawn(cls, game, positions):
+        config = game.config
+        x = min(x for x, y in positions)
+        y = min(y for x, y in positions)
+        base_speed = config["enemy_base_speed"] * config["enemy_speed_growth"] ** (game.wave - 1)
+        anchor = game.world.spawn(position=(x, y), march=(0, config["enemy_move_delay"], config["enemy_step_size"],
+                                                          1, base_speed, 1, False))
+        for member_x, member_y in positions:
+            Enemy.spawn(game, member_x, member_y, attached=(anchor, member_x - x, member_y - y), invader=(),
+                        health=(1,), loot=(0.1, -1, 0.5),
+                        gun=gun(game.rng.randint(60, 180), reload=(120, 240), chance=0.2, cap=3,
+                                muzzle=(Enemy.width // 2, Enemy.height)))
+        return anchor
+
+def render_special_enemy(sprite):
+    width, height = SpecialEnemy.width, SpecialEnemy.height
+    pygame.draw.ellipse(sprite, (150, 150, 150), (0, height // 2, width, height // 2))
+    pygame.draw.arc(sprite, (200, 200, 200), (0, 0, width, height), math.pi, 2 * math.pi, 5)
+    for i in range(3):
+        x = (i + 1) * width // 4
+        y = height // 2
+        pygame.draw.circle(sprite, (255, 255, 0), (x, y), 5)
 
-    def update(self):
-        if self.collected:
-            self.collection_time += 1
-        else:
-            self.move()
-            if self.y == self.ground_level:
-                self.lifetime -= 1
+class SpecialEnemy:
+    """A saucer that crosses the screen in stops and drops a 1UP. It is an entity in the game's World."""
+    width = 60
+    height = 40
+    speed = 2
+    SPRITE = World.sprite(("special_enemy",), (width, height), render_special_enemy)
+    EXPLOSION = World.explosion((((200, 200, 200), 40, 5.0, 45), (YELLOW, 20, 3.0, 45)))
+
+    @classmethod
+    def spawn(cls, world, rng):
+        goal, pause = next_goal(rng, 0)
+        return world.spawn(position=(-cls.width, 50), size=(cls.width, cls.height), sprite=(cls.SPRITE,),
+                           patrol=(goal, pause, cls.speed), health=(3,), armored=(), flinches=(), bounty=(100,),
+                           debris=(cls.EXPLOSION,), loot=(1.0, ExtraLifePowerUp.EFFECT, 1.0),
+                           gun=gun(0, reload=(90, 150), aimed=True, speed=(3, 3),
+                                   muzzle=(cls.width // 2, cls.height)))
 
 class Boss:
-    def __init__(self, x, y, health, game):
-        self.x = x
-        self.y = y
-        self.health = health
-        self.game = game
-        self.parts = [
-            {"x": x - 20, "y": y, "hit_points": 3},
-            {"x": x, "y": y, "hit_points": 3},
-            {"x": x + 20, "y": y, "hit_points": 3},
-            # Add more parts as needed
-        ]
-        self.core_exposed = False
-        self.core_health = 10
-        self.direction = 1
-
-    def move(self):
-        self.x += self.direction * 2  # Boss moves left and right
-        if self.x < 0 or self.x > WIDTH:
-            self.direction *= -1
-
-    def attack(self):
-        # Logic for shooting lasers or using tentacles
-        if random.random() < 0.05:  # 5% chance to shoot
-            return EnemyBullet(self.x, self.y + 10)
-        return None
-
-    def take_damage(self, part_index):
-        self.parts[part_index]["hit_points"] -= 1
-        if all(part["hit_points"] <= 0 for part in self.parts):
-            self.core_exposed = True
-
-    def take_core_damage(self):
-        if self.core_exposed:
-            self.core_health -= 1
-            if self.core_health <= 0:
-                self.die()
-
-    def die(self):
-        # Logic for boss defeat
-        self.game.score += 500
-        self.game.boss = None
-
-    def draw(self):
-        # Draw the boss and its parts
-        for part in self.parts:
-            color = RED if part["hit_points"] > 0 else BLACK
-            pygame.draw.rect(screen, color, (part["x"], part["y"], 20, 20))
-        if self.core_exposed:
-            pygame.draw.circle(screen, YELLOW, (self.x, self.y), 10)
+    """A core behind a row of armor parts, crossing the screen. Its parts and core are entities in the game's World."""
+    part_size = 20
+    core_radius = 10
+    PART_SPRITE = World.sprite(("boss_part", RED), (part_size, part_size), render_fill(RED))
+    WRECK_SPRITE = World.sprite(("boss_part", BLACK), (part_size, part_size), render_fill(BLACK))
+    CORE_SPRITE = World.sprite(("boss_core", core_radius), (2 * core_radius, 2 * core_radius),
+                               render_disc(YELLOW, core_radius))
+    EXPLOSION = World.explosion(((ORANGE, 150, 6.0, 60), (YELLOW, 80, 4.0, 45)))
+
+    @classmethod
+    def spawn(cls, world, x, y):
+        # The core is centered on (x, y) and only becomes a target once every part is destroyed
+        radius = cls.core_radius
+        core = world.spawn(position=(x - radius, y - radius), velocity=(2, 0), bounce=(-radius, WIDTH - radius),
+                           size=(2 * radius, 2 * radius), round=(), core=(10, cls.CORE_SPRITE), bounty=(500,),
+                           debris=(cls.EXPLOSION,), wave=(), gun=gun(0, chance=0.05, muzzle=(radius, 2 * radius)))
+        for offset in (-cls.part_size, 0, cls.part_size):
+            world.spawn(position=(x + offset, y), size=(cls.part_size, cls.part_size), solid=(),
+                        sprite=(cls.PART_SPRITE,), health=(3,), wreck=(cls.WRECK_SPRITE,),
+                        attached=(core, offset + radius, radius))
+        return core
 
 class BonusWave:
+    """Two flocks of enemies that take turns diving at the player."""
     def __init__(self, game):
         self.game = game
-        self.enemies = self.create_bonus_wave_enemies()
         self.launch_cooldown = 120  # Time between launches
         self.launch_timer = self.launch_cooldown
-        self.detached_enemies = []
-        self.flock_bullets = []  # New list for flock enemy bullets
+        self.flock_bullets = ProjectileStore((255, 0, 0))  # Separate store for flock enemy bullets
 
-    def create_bonus_wave_enemies(self):
-        enemies = []
+    def spawn_enemies(self):
         formation = [
             (0, 0), (1, 0), (0.5, 1),
             (-1, 1), (1.5, 1), (-0.5, 2), (2, 2)
         ]
         for flock in range(2):
             for (dx, dy) in formation:
-                x = WIDTH // 4 * (flock + 1) + dx * 40
-                y = 50 + dy * 40
-                enemy = FlyingFlockEnemy(x, y, self.game.wave, self.game)
-                enemies.append(enemy)
-        return enemies
+                FlyingFlockEnemy.spawn(self.game, WIDTH // 4 * (flock + 1) + dx * 40, 50 + dy * 40)
 
-    def update(self):
+    def launch(self):
+        world = self.game.world
         self.launch_timer -= 1
-        if self.launch_timer <= 0 and len(self.detached_enemies) < 3:
+        if self.launch_timer <= 0 and world.count("flock", "diving") < 3:
             self.launch_timer = self.launch_cooldown
-            self.launch_enemy()
-
-        for enemy in self.enemies[:]:
-            enemy.update()
-
-        for enemy in self.detached_enemies[:]:
-            enemy.update()
-            if not enemy.flying_down:
-                self.detached_enemies.remove(enemy)
-                self.enemies.append(enemy)
-                
-        for enemy in self.enemies + self.detached_enemies:
-            bullet = enemy.shoot()
-            if bullet:
-                self.flock_bullets.append(bullet)
-
-        for bullet in self.flock_bullets[:]:
-            bullet.move()
-            if (bullet.x < 0 or bullet.x > WIDTH or
-                bullet.y < 0 or bullet.y > HEIGHT):
-                self.flock_bullets.remove(bullet)
-
-    def launch_enemy(self):
-        if self.enemies:
-            launching_enemy = random.choice(self.enemies)
-            launching_enemy.detach()
-            self.enemies.remove(launching_enemy)
-            self.detached_enemies.append(launching_enemy)
-
-    def draw(self):
-        for enemy in self.enemies + self.detached_enemies:
-            enemy.draw()
-
-        for bullet in self.flock_bullets:
-            bullet.draw()
+            flock = [entity for archetype in world.query("flock") if "diving" not in archetype.components
+                     for entity in archetype["entity"].tolist()]
+            if flock:
+                FlyingFlockEnemy.dive(world, self.game.rng.choice(flock))
 
-    def handle_collisions(self):
-        for bullet in self.game.bullets[:]:
-            for enemy in self.enemies + self.detached_enemies:
-                if enemy.collides_with(bullet):
-                    self.game.bullets.remove(bullet)
-                    if enemy.take_damage(1):  # Changed from 1 to 2
-                        if enemy in self.enemies:
-                            self.enemies.remove(enemy)
-                        else:
-                            self.detached_enemies.remove(enemy)
-                        self.game.score += 10
-                    break
-                    
-        for bullet in self.flock_bullets[:]:
-            if self.game.player.collides_with(bullet):
-                self.game.player.take_damage(35)  # Use the same damage as in other waves
-                self.flock_bullets.remove(bullet)
-                
-        # Add collision check for player and enemies
-        for enemy in self.detached_enemies:
-            if self.game.player.collides_with(enemy):
-                self.game.player.take_damage(35)  # Use the same damage as in other waves
-                enemy.reset_position()  # Reset enemy position after collision
-                    
-    def is_complete(self):
-        return not (self.enemies or self.detached_enemies)
+    def update(self):
+        self.flock_bullets.move()
+        self.flock_bullets.cull(0, 0, WIDTH, HEIGHT)
+
+    def draw(self, surface):
+        return self.flock_bullets.draw(surface)
+
+class FlyingFlockEnemy:
+    """A bonus wave enemy that sways with its flock until it is launched into a dive. It is an entity in the World."""
+    speed = 1
+    dive_speed = 2
+    ram_damage = 35
+
+    @classmethod
+    def spawn(cls, game, x, y):
+        return Enemy.spawn(game, x, y, particles=16, velocity=(cls.speed, 0), bounce=(0, WIDTH - Enemy.width),
+                           home=(x, y, cls.speed), flock=(), health=(2,), armored=(),
+                           gun=gun(game.rng.randint(60, 180), reload=(240, 480), aimed=True, spread=0.2,
+                                   speed=(3, 5), muzzle=(Enemy.width // 2, Enemy.height),
+                                   shot=(FlockEnemyBullet.width, FlockEnemyBullet.height), store=1))
+
+    @classmethod
+    def dive(cls, world, entity):
+        archetype, row = world.locations[entity]
+        archetype["home_dx"][row] = archetype["dx"][row]  # Sways on the same way once back home
+        world.change(entity, add={"velocity": (0, cls.dive_speed), "diving": (), "rams": (cls.ram_damage,)})
 
 class BonusEnemy:
     def __init__(self, x, y, game):
@@ -581,91 +1300,369 @@ class BonusEnemy:
                 self.is_detached = False
                 self.detached_move_counter = 0
 
-    def draw(self):
-        pygame.draw.rect(self.game.screen, self.color, (self.x, self.y, self.width, self.height))
-
-    def special_attack(self):
-        pass
-
-class FlyingFlockEnemy(Enemy):
-    def __init__(self, x, y, wave, game):
-        super().__init__(x, y, wave, game)
-        self.base_x = x
-        self.base_y = y
-        self.flying_down = False
-        self.bomb_cooldown = random.randint(60, 180)
-        self.health = 2
-        self.game = game
-
-    def shoot(self):
-        if self.bomb_cooldown <= 0:
-            self.bomb_cooldown = random.randint(240, 480)  # Reset cooldown
-            angle = math.atan2(self.game.player.y - self.y, self.game.player.x - self.x)
-            angle += random.uniform(-0.2, 0.2)  # Add some randomness to the angle
-            speed = random.uniform(3, 5)  # Randomize bullet speed
-            return FlockEnemyBullet(self.x + self.width // 2, self.y + self.height,
-                                    math.cos(angle) * speed, math.sin(angle) * speed)
-        self.bomb_cooldown -= 1
-        return None
-        
-    def collides_with(self, bullet):
-        return self.x < bullet.x < self.x + self.width and self.y < bullet.y < self.y + self.height
-
-    def take_damage(self, amount):
-        self.health -= amount
-        if self.health <= 0:
-            self.game.explosions.append(Explosion(self.x + self.width // 2, self.y + self.height // 2))
-            return True  # Indicates the enemy is destroyed
-        return False  # Indicates the enemy is still alive
-
-    def reset_position(self):
-        self.x = self.base_x
-        self.y = self.base_y
-        self.flying_down = False
-
-    def move_as_group(self):
-        self.x += self.direction * self.base_speed
-        if self.x < 0 or self.x + self.width > WIDTH:
-            self.direction *= -1
-
-    def move_detached(self):
-        if self.flying_down:
-            self.y += self.base_speed * 2
-            if self.y > HEIGHT:
-                self.reset_position()
-                self.flying_down = False
-
-    def update(self):
-        if not self.flying_down:
-            self.move_as_group()
+    def draw(self, surface):
+        return surface.fill(self.color, (self.x, self.y, self.width, self.height))
+
+
+# Profiling
+class Profiler:
+    """Per-frame phase timings and counters kept in a fixed-size ring buffer."""
+    PHASES = ("events", "player.update", "update_game_objects", "handle_collisions",
+              "bonus_wave.update", "rewind", "draw", "display.flip", "capture")
+    COUNTERS = ("bullets", "enemy_bullets", "enemies", "entities", "particles",
+                "flock_enemies", "flock_bullets", "collision_tests", "surfaces_allocated", "rewind_kb")
+    COLUMNS = ("frame_ms",) + tuple(f"{name}_ms" for name in PHASES) + COUNTERS
+    SPIKE_MS = 1000 / 60
+
+    class Phase:
+        def __init__(self, profiler, index):
+            self.profiler = profiler
+            self.index = index
+            self.start = 0
+            self.children = 0
+
+        def __enter__(self):
+            self.children = 0
+            self.profiler.stack.append(self)
+            self.start = time.perf_counter_ns()
+
+        def __exit__(self, *exc):
+            elapsed = time.perf_counter_ns() - self.start
+            stack = self.profiler.stack
+            stack.pop()
+            self.profiler.current[self.index] += (elapsed - self.children) / 1e6
+            if stack:
+                stack[-1].children += elapsed
+
+    def __init__(self, capacity=600):
+        self.samples = np.zeros((capacity, len(self.COLUMNS)))
+        self.current = np.zeros(len(self.COLUMNS))
+        self.index = 0
+        self.count = 0
+        self.stack = []
+        self.phases = {name: self.Phase(self, i + 1) for i, name in enumerate(self.PHASES)}
+        self.counters = {name: 1 + len(self.PHASES) + i for i, name in enumerate(self.COUNTERS)}
+        self.frame_start = time.perf_counter_ns()
+        self.allocations = 0
+        self.font = None
+        self.overlay = None
+        self.overlay_age = 0
+
+    def phase(self, name):
+        return self.phases[name]
+
+    def add(self, counter, amount=1):
+        self.current[self.counters[counter]] += amount
+
+    def begin_frame(self):
+        self.current[:] = 0
+        self.frame_start = time.perf_counter_ns()
+
+    def end_frame(self, game):
+        self.current[0] = (time.perf_counter_ns() - self.frame_start) / 1e6
+        flock_bullets = len(game.bonus_wave.flock_bullets) if game.bonus_wave else 0
+        for name, value in (("bullets", len(game.bullets)), ("enemy_bullets", len(game.enemy_bullets)),
+                            ("enemies", game.world.count("invader")), ("entities", len(game.world)),
+                            ("particles", len(game.particles)), ("flock_enemies", game.world.count("flock")),
+                            ("flock_bullets", flock_bullets)):
+            self.current[self.counters[name]] = value
+        # Surfaces created by the sprite cache and HUD since the previous frame
+        allocations = sprites.allocations + game.hud.allocations
+        self.current[self.counters["surfaces_allocated"]] = allocations - self.allocations
+        self.allocations = allocations
+        self.current[self.counters["rewind_kb"]] = game.rewind.memory / 1024 if game.rewind else 0
+        self.samples[self.index] = self.current
+        self.index = (self.index + 1) % len(self.samples)
+        self.count = min(self.count + 1, len(self.samples))
+
+    def history(self):
+        # Recorded rows, oldest first
+        if self.count < len(self.samples):
+            return self.samples[:self.count]
+        return np.roll(self.samples, -self.index, axis=0)
+
+    def dump_csv(self, path):
+        np.savetxt(path, self.history(), delimiter=",", header=",".join(self.COLUMNS), comments="", fmt="%.4f")
+
+    def draw(self, surface, window=60):
+        # Rolling averages over the last `window` frames plus spikes over the whole buffer
+        self.overlay_age -= 1
+        if self.overlay is None or self.overlay_age <= 0:
+            self.overlay = self.render_overlay(window)
+            self.overlay_age = 15
+        return surface.blit(self.overlay, (10, 40))
+
+    def render_overlay(self, window):
+        if self.font is None:
+            init_pygame(display=False)
+            self.font = pygame.font.SysFont("monospace", 14)
+        rows = self.history()
+        recent = rows[-window:] if len(rows) else np.zeros((1, len(self.COLUMNS)))
+        averages = recent.mean(axis=0)
+        frame_ms = rows[:, 0] if len(rows) else np.zeros(1)
+        lines = [f"frame {averages[0]:6.2f} ms  max {frame_ms.max():6.2f}  spikes {int((frame_ms > self.SPIKE_MS).sum())}"]
+        lines += [f"{name:<20}{averages[i + 1]:6.2f} ms" for i, name in enumerate(self.PHASES)]
+        lines += [f"{name:<20}{averages[self.counters[name]]:6.0f}" for name in self.COUNTERS]
+        line_height = self.font.get_linesize()
+        panel = pygame.Surface((260, line_height * len(lines) + 8), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        for i, line in enumerate(lines):
+            panel.blit(self.font.render(line, True, (0, 255, 0)), (4, 4 + i * line_height))
+        return panel
+
+# Starfield
+class Starfield:
+    """Parallax star layers scrolling behind everything else."""
+    LAYERS = (  # (stars, size, brightness, speed relative to the nearest layer)
+        (140, 1, 90, 0.25),
+        (70, 1, 170, 0.5),
+        (30, 2, 255, 1.0),
+    )
+    SEED = 7  # Stars are placed by their own generator so they never change gameplay randomness
+
+    def __init__(self, speed=1.0):
+        self.speed = speed  # Pixels per tick of the nearest layer
+        self.layers = None
+        self.offsets = (0,) * len(self.LAYERS)
+        self.still = None  # (offsets, surface) of the layers flattened into one surface
+
+    def build(self):
+        rng = random.Random(self.SEED)
+        self.layers = []
+        for stars, size, brightness, _ in self.LAYERS:
+            layer = pygame.Surface((WIDTH, HEIGHT))
+            for _ in range(stars):
+                layer.fill((brightness,) * 3, (rng.randrange(WIDTH - size + 1), rng.randrange(HEIGHT - size + 1), size, size))
+            if pygame.display.get_surface() is not None:
+                layer = layer.convert()
+            # Black is transparent; run-length encoding lets blits skip the empty space
+            layer.set_colorkey(BLACK, pygame.RLEACCEL)
+            self.layers.append(layer)
+
+    def scroll(self, position):
+        # Move to `position` simulation ticks; returns True if any layer moved on screen
+        offsets = tuple(int(position * self.speed * speed) % HEIGHT for *_, speed in self.LAYERS)
+        moved = offsets != self.offsets
+        self.offsets = offsets
+        return moved
+
+    def draw(self, surface, rect=None):
+        # Draws the whole background, or only the part under `rect`, and returns the rect covered
+        if self.layers is None:
+            self.build()
+        if rect is not None:
+            return surface.blit(self.flattened(), rect.topleft, rect)
+        covered = surface.fill(BLACK)
+        for layer, offset in zip(self.layers, self.offsets):
+            surface.blits(((layer, (0, offset - HEIGHT)), (layer, (0, offset))), doreturn=False)
+        return covered
+
+    def flattened(self):
+        # Erasing many small rects is one blit each from a single opaque copy of the current layers.
+        # A moved starfield gets a new surface, since a recorded frame may still be showing the old one.
+        if self.still is None or self.still[0] != self.offsets:
+            flat = pygame.Surface((WIDTH, HEIGHT))
+            self.draw(flat)
+            if pygame.display.get_surface() is not None:
+                flat = flat.convert()
+            self.still = (self.offsets, flat)
+        return self.still[1]
+
+# Dirty-rectangle rendering
+class DirtyRectRenderer:
+    """Erases and redraws only the screen regions that changed."""
+    def __init__(self, background):
+        self.background = background
+        self.previous = []
+        self.current = []
+        self.full_redraw = True
+
+    def invalidate(self):
+        # Force the next frame to repaint and submit the whole surface
+        self.full_redraw = True
+
+    def begin(self, surface):
+        if self.full_redraw:
+            self.background.draw(surface)
         else:
-            self.move_detached()
-
-    def detach(self):
-        self.flying_down = True
+            for rect in self.previous:
+                self.background.draw(surface, rect)
+        self.current = []
+
+    def add(self, rects):
+        if isinstance(rects, pygame.Rect):
+            self.current.append(rects)
+        elif rects:
+            self.current.extend(rects)
+
+    def end(self, surface):
+        if self.full_redraw:
+            dirty = [surface.get_rect()]
+        else:
+            dirty = self.previous + self.current
+        self.previous = self.current
+        self.full_redraw = False
+        return dirty
+
+# Timed messages
+class MessageOverlay:
+    """Timed on-screen messages drawn as part of normal frames."""
+    def __init__(self):
+        self.queue = deque()  # [text, ticks_left, hold, then]
 
-    def draw(self):
-        super().draw()
-        if self.flying_down:
-            bullet = self.shoot()
-            if bullet:
-                self.game.enemy_bullets.append(bullet)
+    def show(self, text, ticks, hold=True, then=None):
+        if any(entry[0] == text for entry in self.queue):
+            return
+        self.queue.append([text, ticks, hold, then])
 
-class FlockEnemyBullet:
-    def __init__(self, x, y, dx, dy):
-        self.x = x
-        self.y = y
-        self.dx = dx
-        self.dy = dy
-        self.width = 6
-        self.height = 6
+    def current(self):
+        return self.queue[0][0] if self.queue else None
 
-    def move(self):
-        self.x += self.dx
-        self.y += self.dy
+    def tick(self):
+        # Advance the front message; returns True if it holds the simulation for this tick
+        if not self.queue:
+            return False
+        entry = self.queue[0]
+        entry[1] -= 1
+        if entry[1] <= 0:
+            self.queue.popleft()
+            if entry[3]:
+                entry[3]()
+        return entry[2]
+
+    def clear(self):
+        self.queue.clear()
+
+# HUD
+class Hud:
+    """Heads-up display that only re-renders elements whose values changed."""
+    health_bar_width = 200
+    health_bar_height = 20
+    power_bar_width = 150
+    power_bar_height = 10
+    max_cached_texts = 256
 
-    def draw(self):
-        pygame.draw.rect(screen, (255, 0, 0), (int(self.x), int(self.y), self.width, self.height))
+    def __init__(self, game):
+        self.game = game
+        self.texts = {}
+        self.elements = {}
+        self.allocations = 0
+
+    @property
+    def font(self):
+        return self.game.font
+
+    @cached_property
+    def lives_icon(self):
+        icon = pygame.Surface((20, 20), pygame.SRCALPHA)
+        pygame.draw.rect(icon, WHITE, (0, 10, 20, 10))
+        pygame.draw.polygon(icon, WHITE, [(0, 10), (10, 0), (20, 10)])
+        return icon
+
+    @cached_property
+    def power_gradient(self):
+        # Full-width red to yellow gradient, cropped to the current power level when drawn
+        gradient = pygame.Surface((self.power_bar_width, self.power_bar_height))
+        for x in range(self.power_bar_width):
+            t = x / self.power_bar_width
+            color = tuple(int(POWER_RED[i] + (POWER_YELLOW[i] - POWER_RED[i]) * t) for i in range(3))
+            pygame.draw.line(gradient, color, (x, 0), (x, self.power_bar_height))
+        return gradient
+
+    def text(self, string, color=WHITE):
+        key = (string, color)
+        surface = self.texts.get(key)
+        if surface is None:
+            if len(self.texts) >= self.max_cached_texts:
+                self.texts.clear()
+            surface = self.font.render(string, True, color)
+            self.allocations += 1
+            self.texts[key] = surface
+        return surface
+
+    def element(self, name, value, build):
+        # Returns the (surface, position) for an element, rebuilding it only when its value changed
+        cached = self.elements.get(name)
+        if cached is None or cached[0] != value:
+            cached = (value,) + build(value)
+            self.allocations += 1
+            self.elements[name] = cached
+        return cached[1:]
+
+    def build_score(self, score):
+        return self.font.render(f"Score: {score}", True, WHITE), (10, 10)
+
+    def build_wave(self, wave):
+        text = self.font.render(f"Wave: {wave}", True, WHITE)
+        return text, (WIDTH - text.get_width() - 10, 10)
+
+    def build_lives(self, lives):
+        text = self.font.render(f"{lives} x", True, WHITE)
+        layer = pygame.Surface((text.get_width() + 25, max(text.get_height(), 20)), pygame.SRCALPHA)
+        layer.blit(text, (0, 0))
+        layer.blit(self.lives_icon, (text.get_width() + 5, 0))
+        return layer, (WIDTH - text.get_width() - 35, HEIGHT - 30)
+
+    def build_health(self, health_width):
+        text = self.text("HEALTH")
+        bar_x = (WIDTH - self.health_bar_width) // 2
+        bar_y = 10
+        text_y = (self.health_bar_height - text.get_height()) // 2
+        top = min(0, text_y)
+        layer = pygame.Surface((self.health_bar_width, max(self.health_bar_height, text_y + text.get_height()) - top),
+                               pygame.SRCALPHA)
+        pygame.draw.rect(layer, HEALTH_RED, (0, -top, self.health_bar_width, self.health_bar_height))
+        pygame.draw.rect(layer, HEALTH_GREEN, (0, -top, health_width, self.health_bar_height))
+        layer.blit(text, ((self.health_bar_width - text.get_width()) // 2, text_y - top))
+        return layer, (bar_x, bar_y + top)
+
+    def build_power(self, power_width):
+        layer = pygame.Surface((self.power_bar_width, self.power_bar_height))
+        layer.fill(POWER_RED)
+        layer.blit(self.power_gradient, (0, 0), (0, 0, power_width, self.power_bar_height))
+        return layer, (10, HEIGHT - self.power_bar_height - 10)
+
+    def build_power_ups(self, timers):
+        rows = []
+        for power_up, timer_text in timers:
+            icon = self.game.power_up_icons[power_up]
+            rows.append((self.text(timer_text), icon))
+        width = max((timer.get_width() + icon.get_width() + 5 for timer, icon in rows), default=0)
+        layer = pygame.Surface((width, 30 * len(rows)), pygame.SRCALPHA)
+        for row, (timer, icon) in enumerate(rows):
+            layer.blit(timer, (width - timer.get_width() - icon.get_width() - 5, row * 30))
+            layer.blit(icon, (width - icon.get_width(), row * 30))
+        return layer, (WIDTH - width - 10, 90)
+
+    def power_up_timers(self):
+        player = self.game.player
+        timers = []
+        for power_up, duration in [("shield", player.shield_time),
+                                   ("double_shoot", player.double_shoot_time),
+                                   ("penetrating", player.penetrating_bullets_time)]:
+            if duration > 0 and not math.isnan(duration):
+                try:
+                    timer_text = f"{int(duration // 60):02d}s"
+                except ValueError:
+                    timer_text = "00s"
+                timers.append((power_up, timer_text))
+        return tuple(timers)
+
+    def draw(self, surface):
+        game = self.game
+        player = game.player
+        health_width = int(self.health_bar_width * player.health / player.max_health)
+        power_width = int(self.power_bar_width * player.power / player.max_power)
+        rects = []
+        for name, value, build in (("score", game.score, self.build_score),
+                                   ("wave", game.wave, self.build_wave),
+                                   ("lives", player.lives, self.build_lives),
+                                   ("health", health_width, self.build_health),
+                                   ("power", power_width, self.build_power),
+                                   ("power_ups", self.power_up_timers(), self.build_power_ups)):
+            layer, position = self.element(name, value, build)
+            rects.append(surface.blit(layer, position))
+        return rects
 
 # Game states
 class GameState:
@@ -673,12 +1670,617 @@ class GameState:
     PLAYING = 1
     GAME_OVER = 2
 
+# Per-frame player inputs, combined as a bitmask and passed to Game.step
+class Input:
+    LEFT = 1
+    RIGHT = 2
+    FIRE = 4
+    PAUSE = 8  # Toggles pause on the frame it is set
+
+    @staticmethod
+    def from_keys(keys):
+        inputs = 0
+        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+            inputs |= Input.LEFT
+        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+            inputs |= Input.RIGHT
+        if keys[pygame.K_SPACE]:
+            inputs |= Input.FIRE
+        return inputs
+
+# Replays
+class Replay:
+    """A recorded game: the RNG seed plus one Input bitmask per simulation frame."""
+    MAGIC = b"SSRP"
+    VERSION = 2
+    HEADER = struct.Struct("<4sBQI")
+
+    def __init__(self, seed, inputs=b""):
+        self.seed = seed
+        self.inputs = bytearray(inputs)
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def record(self, inputs):
+        self.inputs.append(inputs)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.seed, len(self.inputs)))
+            f.write(zlib.compress(bytes(self.inputs), 9))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, seed, frames = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f"{path} is not a version {cls.VERSION} replay file")
+        inputs = zlib.decompress(data[cls.HEADER.size:])
+        if len(inputs) != frames:
+            raise ValueError(f"{path} is truncated: expected {frames} frames, found {len(inputs)}")
+        return cls(seed, inputs)
+
+    def play(self, game=None):
+        # Re-simulates the recording headless, as fast as possible, and returns the finished game
+        game = game or Game(headless=True, seed=self.seed)
+        game.start_game()
+        for inputs in self.inputs:
+            game.step(inputs)
+        return game
+
+    def render(self, recorder, game=None):
+        # Like play, but draws every tick and hands the frame to the recorder, waiting rather than dropping frames
+        game = game or Game(headless=True, seed=self.seed)
+        game.start_game()
+        for inputs in self.inputs:
+            game.step(inputs)
+            game.draw()
+            recorder.capture(game.screen, block=True)
+        return game
+
+# Frame capture
+class FrameRecorder:
+    """Writes captured frames as PNGs, or as raw rgb24 when the path ends in .rgb or .raw."""
+    RAW_EXTENSIONS = (".rgb", ".raw")
+
+    def __init__(self, path, queue_size=30, compression=1):
+        self.path = path
+        self.raw = path.lower().endswith(self.RAW_EXTENSIONS)
+        self.compression = compression
+        self.frames = queue.Queue(queue_size)
+        self.captured = 0
+        self.written = 0
+        self.dropped = 0
+        self.error = None  # The exception that stopped the writer, re-raised on the caller's thread
+        if self.raw:
+            self.stream = open(path, "wb")
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.stream = None
+        self.thread = threading.Thread(target=self.write_frames, name="FrameRecorder", daemon=True)
+        self.thread.start()
+
+    def capture(self, surface, block=False):
+        """Queue a copy of the surface's pixels; returns False when the frame was dropped."""
+        if self.error is not None:
+            raise self.error
+        if surface.get_bytesize() == 4:
+            # A raw copy of the pixel buffer is a single memcpy; the channel order is sorted out by the writer
+            pixels = surface.get_buffer().raw
+            offsets = tuple(shift // 8 for shift in surface.get_shifts()[:3])
+            frame = (pixels, surface.get_size(), surface.get_pitch(), 4, offsets)
+        else:
+            frame = (pygame.image.tobytes(surface, "RGB"), surface.get_size(), surface.get_width() * 3, 3, (0, 1, 2))
+        try:
+            self.frames.put(frame, block=block)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.captured += 1
+        return True
+
+    def write_frames(self):
+        buffer = None
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+            if self.error is not None:
+                continue  # Keep draining the queue so a blocking capture() or close() never waits forever
+            try:
+                buffer = self.write_frame(frame, buffer)
+            except Exception as error:
+                self.error = error
+
+    def write_frame(self, frame, buffer):
+        # Converts one frame into the reusable buffer and writes it; returns the buffer
+        pixels, (width, height), pitch, bytesize, offsets = frame
+        if buffer is None or buffer.shape[:2] != (height, width * 3 + (not self.raw)):
+            # PNG scanlines start with their filter type; 0 stores the row unfiltered
+            buffer = np.zeros((height, width * 3 + (not self.raw)), np.uint8)
+        rgb = buffer[:, buffer.shape[1] - width * 3:].reshape(height, width, 3)
+        source = np.frombuffer(pixels, np.uint8).reshape(height, pitch)[:, :width * bytesize]
+        source = source.reshape(height, width, bytesize)
+        # One channel at a time into a preallocated buffer; fancy indexing would allocate and copy twice
+        for channel, offset in enumerate(offsets):
+            rgb[:, :, channel] = source[:, :, offset]
+        if self.raw:
+            self.stream.write(buffer)
+        else:
+            self.write_png(os.path.join(self.path, f"frame_{self.written:06d}.png"), width, height, buffer)
+        self.written += 1
+        return buffer
+
+    def write_png(self, path, width, height, scanlines):
+        def chunk(kind, data):
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+        with open(path, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n")
+            f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+            f.write(chunk(b"IDAT", zlib.compress(scanlines, self.compression)))
+            f.write(chunk(b"IEND", b""))
+
+    def close(self):
+        # Waits for every queued frame to be written, then raises any error the writer hit
+        self.frames.put(None)
+        self.thread.join()
+        if self.stream:
+            self.stream.close()
+        if self.error is not None:
+            raise self.error
+
+# Save states
+class SaveState:
+    """A snapshot of the whole simulation in a compact, versioned binary format."""
+    MAGIC = b"SSSV"
+    VERSION = 3
+    HEADER = struct.Struct("<4sBI")  # magic, version, payload size
+
+    GAME = struct.Struct("<qIB?IidB?")  # score, wave, state, paused, frame, special timer, step size, inputs, god mode
+    RNG = struct.Struct("<625I?d")
+    PARTICLE_RNG = struct.Struct("<16s16sBI")
+    PLAYER = struct.Struct("<dd?i?i?diddddi?")
+    COUNT = struct.Struct("<I")
+    BONUS = struct.Struct("<ii")  # launch cooldown, launch timer
+    ARCHETYPE = struct.Struct("<HI")  # component names length, entities
+    MESSAGE = struct.Struct("<HiB?")  # text length, ticks, callback name length, hold
+    COLOR = struct.Struct("<3B")
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    # Writing
+    @classmethod
+    def capture(cls, game):
+        out = []
+        player = game.player
+        out.append(cls.GAME.pack(game.score, game.wave, game.state, game.paused, game.frame, game.special_enemy_timer,
+                                 game.enemy_step_size, game.inputs, game.god_mode))
+        version, internal, gauss = game.rng.getstate()
+        out.append(cls.RNG.pack(*internal, gauss is not None, gauss or 0.0))
+        out.append(cls.PLAYER.pack(player.x, player.y, player.double_shoot, player.double_shoot_time,
+                                   player.penetrating_bullets, player.penetrating_bullets_time, player.shield_active,
+                                   player.shield_time, player.lives, player.health, player.power, player.shoot_cooldown,
+                                   player.shoot_delay, player.respawn_shield_time, player.god_mode))
+        cls.write_store(out, game.bullets)
+        cls.write_store(out, game.enemy_bullets)
+
+        bonus = game.bonus_wave
+        out.append(cls.COUNT.pack(bonus is not None))
+        if bonus:
+            out.append(cls.BONUS.pack(bonus.launch_cooldown, bonus.launch_timer))
+            cls.write_store(out, bonus.flock_bullets)
+
+        cls.write_world(out, game.world)
+
+        particles = game.particles
+        state = particles.rng.bit_generator.state
+        out.append(cls.PARTICLE_RNG.pack(state["state"]["state"].to_bytes(16, "little"),
+                                         state["state"]["inc"].to_bytes(16, "little"),
+                                         state["has_uint32"], state["uinteger"]))
+        out.append(cls.COUNT.pack(len(particles.palette)))
+        out.extend(cls.COLOR.pack(*color) for color in particles.palette)
+        cls.write_store(out, particles)
+
+        out.append(cls.COUNT.pack(len(game.messages.queue)))
+        for text, ticks, hold, then in game.messages.queue:
+            # Callbacks are stored by name and must be methods of the game
+            name = b""
+            if then is not None:
+                if getattr(then, "__self__", None) is not game:
+                    raise ValueError(f"cannot save message callback {then!r}")
+                name = then.__name__.encode("ascii")
+            text = text.encode("utf-8")
+            out.append(cls.MESSAGE.pack(len(text), ticks, len(name), hold))
+            out.append(text)
+            out.append(name)
+        return cls(b"".join(out))
+
+    @classmethod
+    def write_store(cls, out, store):
+        n = len(store)
+        out.append(cls.COUNT.pack(n))
+        out.extend(arr[:n].tobytes() for arr in store.arrays())
+
+    @classmethod
+    def write_world(cls, out, world):
+        # Each archetype as its component names, entity ids and columns; components refer to entities by id
+        archetypes = world.query()
+        out.append(cls.COUNT.pack(world.next_entity))
+        out.append(cls.COUNT.pack(len(archetypes)))
+        for archetype in archetypes:
+            name = ",".join(sorted(archetype.components)).encode()
+            out.append(cls.ARCHETYPE.pack(len(name), len(archetype)))
+            out.append(name)
+            out.append(archetype["entity"].tobytes())
+            out.extend(arr[:len(archetype)].tobytes() for arr in archetype.arrays())
+
+    # Reading
+    def restore(self, game):
+        view = memoryview(self.data)
+        offset = 0
+
+        def read(layout):
+            nonlocal offset
+            values = layout.unpack_from(view, offset)
+            offset += layout.size
+            return values
+
+        def read_bytes(size):
+            nonlocal offset
+            offset += size
+            return view[offset - size:offset]
+
+        def read_store(store):
+            nonlocal offset
+            n, = read(self.COUNT)
+            if n > len(store.x):
+                store.grow(n)
+            for arr in store.arrays():
+                arr[:n] = np.frombuffer(view, dtype=arr.dtype, count=n, offset=offset)
+                offset += n * arr.itemsize
+            store.count = n
+
+        (game.score, game.wave, game.state, game.paused, game.frame, game.special_enemy_timer,
+         game.enemy_step_size, game.inputs, game.god_mode) = read(self.GAME)
+        *internal, has_gauss, gauss = read(self.RNG)
+        player = game.player
+        (player.x, player.y, player.double_shoot, player.double_shoot_time, player.penetrating_bullets,
+         player.penetrating_bullets_time, player.shield_active, player.shield_time, player.lives, player.health,
+         player.power, player.shoot_cooldown, player.shoot_delay, player.respawn_shield_time,
+         player.god_mode) = read(self.PLAYER)
+        read_store(game.bullets)
+        read_store(game.enemy_bullets)
+
+        game.bonus_wave = None
+        if read(self.COUNT)[0]:
+            bonus = BonusWave(game)
+            bonus.launch_cooldown, bonus.launch_timer = read(self.BONUS)
+            read_store(bonus.flock_bullets)
+            game.bonus_wave = bonus
+
+        world = game.world
+        world.clear()
+        world.next_entity, = read(self.COUNT)
+        for _ in range(read(self.COUNT)[0]):
+            size, n = read(self.ARCHETYPE)
+            components = bytes(read_bytes(size)).decode().split(",")
+            archetype, start = world.extend(components, n, np.frombuffer(view, dtype=np.int64, count=n, offset=offset))
+            offset += n * 8
+            for arr in archetype.arrays():
+                arr[start:start + n] = np.frombuffer(view, dtype=arr.dtype, count=n, offset=offset)
+                offset += n * arr.itemsize
+
+        particles = game.particles
+        state, inc, has_uint32, uinteger = read(self.PARTICLE_RNG)
+        particles.rng.bit_generator.state = {
+            "bit_generator": "PCG64",
+            "state": {"state": int.from_bytes(state, "little"), "inc": int.from_bytes(inc, "little")},
+            "has_uint32": has_uint32, "uinteger": uinteger}
+        particles.palette = [read(self.COLOR) for _ in range(read(self.COUNT)[0])]
+        particles.tints = {color: index for index, color in enumerate(particles.palette)}
+        particles.frames = []
+        read_store(particles)
+
+        game.messages.clear()
+        for _ in range(read(self.COUNT)[0]):
+            text_size, ticks, name_size, hold = read(self.MESSAGE)
+            text = str(read_bytes(text_size), "utf-8")
+            name = str(read_bytes(name_size), "ascii")
+            game.messages.queue.append([text, ticks, hold, getattr(game, name) if name else None])
+
+        game.rng.setstate((3, tuple(internal), gauss if has_gauss else None))
+        # The restored game is a new timeline: stop recording it as a replay of the old one
+        game.replay = None
+        game.renderer.invalidate()
+        game.save_positions()
+
+    # Files
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(self.data)))
+            f.write(self.data)
+
+    @classmethod
+    def load(cls, path, memory_map=False):
+        with open(path, "rb") as f:
+            if memory_map:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = f.read()
+        if len(data) < cls.HEADER.size:
+            raise ValueError(f"{path} is not a save state file")
+        magic, version, size = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f"{path} is not a version {cls.VERSION} save state file")
+        if len(data) - cls.HEADER.size != size:
+            raise ValueError(f"{path} is truncated: expected {size} bytes, found {len(data) - cls.HEADER.size}")
+        return cls(memoryview(data)[cls.HEADER.size:])
+
+# Rewind
+class RewindBuffer:
+    """The last few seconds of simulation, kept as save states for scrubbing backward."""
+    def __init__(self, max_ticks, keyframe_interval, memory_limit):
+        self.max_ticks = max_ticks
+        self.keyframe_interval = keyframe_interval
+        self.memory_limit = memory_limit
+        self.segments = deque()  # [keyframe, [delta, ...]]
+        self.ticks = 0
+        self.memory = 0
+
+    def __len__(self):
+        return self.ticks
+
+    def clear(self):
+        self.segments.clear()
+        self.ticks = 0
+        self.memory = 0
+
+    def push(self, state):
+        data = bytes(state.data)
+        if not self.segments or len(self.segments[-1][1]) + 1 >= self.keyframe_interval:
+            self.segments.append([data, []])
+            self.memory += len(data)
+        else:
+            keyframe, deltas = self.segments[-1]
+            compressor = zlib.compressobj(1, zdict=keyframe)
+            delta = compressor.compress(data) + compressor.flush()
+            deltas.append(delta)
+            self.memory += len(delta)
+        self.ticks += 1
+        while len(self.segments) > 1 and (self.ticks > self.max_ticks or self.memory > self.memory_limit):
+            keyframe, deltas = self.segments.popleft()
+            self.ticks -= 1 + len(deltas)
+            self.memory -= len(keyframe) + sum(len(delta) for delta in deltas)
+
+    def pop(self):
+        # The most recent state, removed from the buffer; None once the history is used up
+        if not self.segments:
+            return None
+        keyframe, deltas = self.segments[-1]
+        self.ticks -= 1
+        if deltas:
+            delta = deltas.pop()
+            self.memory -= len(delta)
+            return SaveState(zlib.decompressobj(zdict=keyframe).decompress(delta))
+        self.segments.pop()
+        self.memory -= len(keyframe)
+        return SaveState(keyframe)
+
+# Frame loop
+class FrameLoop:
+    """Turns window events and elapsed time into simulation ticks and a drawn frame."""
+    def __init__(self, game, record_path=None, state_path=None):
+        self.game = game
+        self.record_path = record_path
+        self.state_path = state_path
+        self.accumulator = 0.0
+        self.previous_time = time.perf_counter()
+        self.pending_inputs = 0
+
+    def frame(self, events, keys):
+        game = self.game
+        for event in events:
+            if event.type == pygame.KEYDOWN:
+                self.key_down(event.key)
+        alpha = self.simulate(keys)
+        with game.profiler.phase("draw"):
+            game.draw(alpha if game.config["interpolate"] else 1.0)
+
+    def key_down(self, key):
+        game = self.game
+        if key == pygame.K_SPACE and game.state == GameState.MENU:
+            game.save_replay(self.record_path)
+            game.start_game()  # Start the game at wave 1
+        elif key == pygame.K_r and game.state == GameState.GAME_OVER:
+            game.save_replay(self.record_path)
+            screen = game.screen  # Keep drawing into the current frame, which may be a RenderList
+            game.__init__(game.headless, config=game.overrides)
+            game.screen = screen
+        elif key == pygame.K_m or key == pygame.K_ESCAPE:
+            game.state = GameState.MENU
+        elif key == pygame.K_p:
+            if game.state == GameState.PLAYING:
+                self.pending_inputs |= Input.PAUSE  # Applied on the next tick so replays see it
+            else:
+                game.paused = not game.paused
+        elif key == pygame.K_g:
+            game.toggle_god_mode()
+        elif key == pygame.K_F3:
+            game.show_profiler = not game.show_profiler
+        elif key == pygame.K_F4:
+            path = time.strftime("profile-%Y%m%d-%H%M%S.csv")
+            game.profiler.dump_csv(path)
+            print(f"Frame profile written to {path}")
+        elif key == pygame.K_F5 and game.state == GameState.PLAYING:
+            game.quick_save = game.save_state()
+            if self.state_path:
+                game.quick_save.save(self.state_path)
+            game.show_message("Quick save", duration=1000, hold=False)
+        elif key == pygame.K_F9 and game.quick_save:
+            game.save_replay(self.record_path)
+            game.load_state(game.quick_save)
+            game.show_message("Quick load", duration=1000, hold=False)
+        elif key in range(pygame.K_0, pygame.K_9 + 1):
+            game.jump_to_wave(key - pygame.K_0)  # Correct method name
+
+    def simulate(self, keys):
+        # Fixed-timestep simulation: run as many ticks as the elapsed time calls for,
+        # skipping rendered frames under load but never more than max_frame_skip ticks.
+        # Returns how far the next tick has progressed, for interpolation.
+        game = self.game
+        tick = 1.0 / game.config["fps"]
+        now = time.perf_counter()
+        self.accumulator = min(self.accumulator + now - self.previous_time, game.config["max_frame_skip"] * tick)
+        self.previous_time = now
+        if game.state == GameState.PLAYING:
+            inputs = Input.from_keys(keys)
+            rewinding = game.rewind is not None and keys[pygame.K_BACKSPACE] and not game.paused
+            if rewinding and not game.rewinding:
+                game.save_replay(self.record_path)  # Rewinding starts a new timeline and ends the recording
+                game.rewind.pop()  # The newest entry is the state on screen
+            game.rewinding = rewinding
+            while self.accumulator >= tick:
+                game.save_positions()
+                if rewinding:
+                    # Scrub backward one tick per tick of real time
+                    game.step_back()
+                else:
+                    game.step(inputs | self.pending_inputs)
+                    self.pending_inputs = 0
+                self.accumulator -= tick
+        else:
+            self.accumulator = 0.0
+            game.rewinding = False
+        return self.accumulator / tick
+
+# Pipelined rendering
+class RenderList:
+    """A frame recorded as fill and blit commands, to be replayed onto the window by another thread."""
+    def __init__(self, size=(WIDTH, HEIGHT)):
+        self.rect = pygame.Rect((0, 0), size)
+        self.commands = []  # (color, rect) fills and lists of consecutive blits, in drawing order
+        self.dirty = None  # Rects to update once replayed, or None to flip the whole screen
+
+    def get_rect(self):
+        return self.rect.copy()
+
+    def get_size(self):
+        return self.rect.size
+
+    def fill(self, color, rect=None):
+        rect = self.rect.copy() if rect is None else pygame.Rect(rect)
+        self.commands.append((color, rect))
+        return rect
+
+    def batch(self):
+        if not self.commands or type(self.commands[-1]) is not list:
+            self.commands.append([])
+        return self.commands[-1]
+
+    def blit(self, source, dest, area=None):
+        if area is None:
+            self.batch().append((source, dest))
+            return pygame.Rect(dest, source.get_size())
+        self.batch().append((source, dest, area))
+        return pygame.Rect(dest, pygame.Rect(area).size)
+
+    def blits(self, blit_sequence, doreturn=True):
+        blit_sequence = list(blit_sequence)
+        self.batch().extend(blit_sequence)
+        if doreturn:
+            return [pygame.Rect(blit[1], blit[0].get_size() if len(blit) < 3 else pygame.Rect(blit[2]).size)
+                    for blit in blit_sequence]
+        return None
+
+    def show(self, surface):
+        # Replay the commands onto the window surface and present the frame
+        for command in self.commands:
+            if type(command) is list:
+                surface.blits(command, doreturn=False)
+            else:
+                surface.fill(*command)
+        if self.dirty is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.dirty)
+
+
+class RenderPipeline:
+    """Runs a FrameLoop on a simulation thread, one frame ahead of the window."""
+    def __init__(self, loop, keys):
+        self.loop = loop
+        self.inbox = deque()  # (events, keys) from the main thread; deque appends and pops are atomic
+        self.keys = keys
+        self.free = threading.Semaphore(1)
+        self.ready = threading.Semaphore(0)
+        self.slot = None
+        self.running = True
+        self.error = None
+        self.thread = threading.Thread(target=self.simulate, name="Simulation", daemon=True)
+        self.thread.start()
+
+    def send(self, events, keys):
+        self.inbox.append((events, keys))
+
+    def simulate(self):
+        game = self.loop.game
+        try:
+            while True:
+                # Wait until the main thread has taken the previous frame, so at most one frame is ahead
+                self.free.acquire()
+                if not self.running:
+                    break
+                events = []
+                while self.inbox:
+                    batch, self.keys = self.inbox.popleft()
+                    events.extend(batch)
+                profiler = game.profiler
+                profiler.begin_frame()
+                game.screen = RenderList()
+                self.loop.frame(events, self.keys)
+                profiler.end_frame(game)
+                self.slot = game.screen
+                self.ready.release()
+        except BaseException as error:
+            self.error = error
+            self.ready.release()
+
+    def next_frame(self):
+        # Blocks until the simulation thread has finished the next frame
+        self.ready.acquire()
+        if self.error is not None:
+            raise self.error
+        frame, self.slot = self.slot, None
+        self.free.release()
+        return frame
+
+    def stop(self):
+        self.running = False
+        self.free.release()
+        self.thread.join()
+
 # Game
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    def __init__(self, headless=False, seed=None, config=None):
+        # Headless games simulate without a window and draw to an offscreen surface
+        self.headless = headless
+        if headless:
+            self.screen = pygame.Surface((WIDTH, HEIGHT))
+        else:
+            # Opened by open_window when the game starts running; a restarted game keeps its window
+            self.screen = pygame.display.get_surface() if pygame.display.get_init() else None
+        # All gameplay randomness comes from this generator so games can be replayed
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.replay = None
         self.god_mode = False
-        self.font = pygame.font.Font(None, 36)
         self.enemy_shoot_frequency = 0.02  # Base frequency for enemy shooting
 
         # Game Configuration
@@ -690,7 +2292,8 @@ class Game:
             "player_lives": 3,
             # Enemy settings
             "enemy_step_size": 4,
-            "enemy_base_speed": 2,  # increase to speed up alien marching
+            "enemy_base_speed": 1,  # increase to speed up alien marching
+            "enemy_speed_growth": 1.0,  # Marching speed multiplier per wave after the first (e.g. 1.1 = 10% faster each wave)
             "enemy_move_delay": 40,
             "enemy_speed_multiplier_group": 3,
             "enemy_speed_multiplier_last": 4,
@@ -699,8 +2302,25 @@ class Game:
             "double_shoot_duration": 20,
             "penetrating_duration": 10,
             # Game speed
-            "fps": 60
+            "fps": 60,  # Simulation ticks per second; all frame-based durations are counted in ticks
+            "render_fps": 0,  # Cap on rendered frames per second (0 = as fast as the display allows)
+            "max_frame_skip": 5,  # Most simulation ticks run per rendered frame before the game slows down
+            "interpolate": True,  # Draw positions interpolated between the last two simulation ticks
+            # Rendering
+            "dirty_rects": False,  # Redraw only changed regions instead of the whole screen (faster on slow machines)
+            "pipeline": False,  # Simulate and record each frame on a second thread while the window shows the last one
+            "starfield_speed": 1.0,  # Pixels per tick of the nearest star layer (0 holds the stars still)
+            # Every star move repaints the whole screen, which would undo dirty_rects, so with dirty_rects on
+            # the stars only move every this many ticks (0 keeps them still)
+            "starfield_dirty_interval": 0,
+            # Rewind (hold Backspace)
+            "rewind_seconds": 10,  # Seconds of play kept for rewinding (0 disables it)
+            "rewind_keyframe_interval": 30,  # Ticks between full snapshots; the ticks in between are stored as deltas
+            "rewind_memory_kb": 4096  # Memory cap for the rewind history; the oldest history is dropped first
         }
+        # Overrides, e.g. from the batch runner's config sweeps; kept so a restarted game keeps them
+        self.overrides = dict(config or {})
+        self.config.update(self.overrides)
 
         # Convert power-up durations to frames
         for key in ["shield_duration", "double_shoot_duration", "penetrating_duration"]:
@@ -717,82 +2337,185 @@ class Game:
         self.respawn_shield_duration = 5 * self.config["fps"]  # Adjust this value as needed (e.g., 10 seconds)
 
         self.player = Player(self)
-        self.bullets = []
-        self.enemies = []
-        self.enemy_bullets = []
-        self.powerups = []
-        self.explosions = []
+        self.bullets = ProjectileStore(WHITE, YELLOW)
+        self.enemy_bullets = ProjectileStore((255, 0, 0))
+        self.world = World()  # Enemies, power-ups and the other entities built from components
+        self.particles = ParticleSystem(self.seed)
         self.score = 0
         self.state = GameState.MENU
         self.wave = 1
-        self.enemies_speed_increased = False
         self.calculate_enemy_step_size()
         self.paused = False
-        self.power_up_icons = self.create_power_up_icons()
-        self.special_enemy = None
+        self.hud = Hud(self)
+        self.pause_overlay = None
+        self.starfield = Starfield(self.config["starfield_speed"])
+        self.renderer = DirtyRectRenderer(self.starfield)
+        self.profiler = Profiler()
+        self.show_profiler = False
+        self.messages = MessageOverlay()
         self.special_enemy_timer = 0
         self.enemy_colors = [RED, GREEN, PURPLE, ORANGE, BLUE, YELLOW]
         self.eye_colors = [WHITE, YELLOW, CYAN, MAGENTA, GREEN, RED]
-        self.boss = None
         self.bonus_wave = None
-
-    def run(self):
+        self.collision_grid = SpatialGrid()
+        self.inputs = 0
+        self.frame = 0
+        self.previous_positions = []
+        self.previous_world = (np.zeros(0, np.int64), np.zeros(0), np.zeros(0))
+        self.advanced = False  # Whether the last tick moved the simulation, i.e. there is motion to interpolate
+        self.quick_save = None
+        # Headless games are driven by tools that have no use for rewinding, so they skip its per-tick cost
+        self.rewind = None
+        if self.config["rewind_seconds"] > 0 and not headless:
+            self.rewind = RewindBuffer(self.config["rewind_seconds"] * self.config["fps"],
+                                       self.config["rewind_keyframe_interval"], self.config["rewind_memory_kb"] * 1024)
+        self.rewinding = False
+
+    @cached_property
+    def font(self):
+        init_pygame(display=False)
+        return pygame.font.Font(None, 36)
+
+    @cached_property
+    def power_up_icons(self):
+        return self.create_power_up_icons()
+
+    def open_window(self):
+        init_pygame()
+        if self.screen is None:
+            self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+            pygame.display.set_caption("Space Shooter")
+
+    def save_state(self):
+        return SaveState.capture(self)
+
+    def load_state(self, state):
+        state.restore(self)
+
+    def run(self, record_path=None, profile_path=None, state_path=None, capture_path=None):
+        self.open_window()
+        recorder = FrameRecorder(capture_path) if capture_path else None
+        loop = FrameLoop(self, record_path, state_path)
         clock = pygame.time.Clock()
         running = True
+        if self.config["pipeline"]:
+            window = self.screen
+            pipeline = RenderPipeline(loop, pygame.key.get_pressed())
+            try:
+                while running:
+                    events = pygame.event.get()
+                    running = not any(event.type == pygame.QUIT for event in events)
+                    pipeline.send(events, pygame.key.get_pressed())
+                    pipeline.next_frame().show(window)
+                    if recorder:
+                        recorder.capture(window)
+                    clock.tick(self.config["render_fps"])
+            finally:
+                pipeline.stop()
+                self.screen = window
         while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_SPACE and self.state == GameState.MENU:
-                        self.start_game()  # Start the game at wave 1
-                    elif event.key == pygame.K_r and self.state == GameState.GAME_OVER:
-                        self.__init__()
-                    elif event.key == pygame.K_m or event.key == pygame.K_ESCAPE:
-                        self.state = GameState.MENU
-                    elif event.key == pygame.K_p:
-                        self.paused = not self.paused
-                    elif event.key == pygame.K_g:
-                        self.toggle_god_mode()
-                    elif event.key in range(pygame.K_0, pygame.K_9 + 1):
-                        self.jump_to_wave(event.key - pygame.K_0)  # Correct method name
-
-            if self.state == GameState.PLAYING and not self.paused:
-                keys = pygame.key.get_pressed()
-                if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-                    self.player.move(-self.player.speed)
-                if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-                    self.player.move(self.player.speed)
-                if keys[pygame.K_SPACE]:
-                    self.try_shoot()
-
-                self.player.update()
-                self.update_game_objects()
-                self.handle_collisions()
-
-                if not self.enemies and (not hasattr(self, 'bonus_wave') or self.bonus_wave is None or self.bonus_wave.is_complete()):
-                    self.wave += 1
-                    self.increase_difficulty()  # Increase difficulty before spawning the next wave
-                    if self.wave % 5 == 0:
-                        self.spawn_bonus_wave()
-                    else:
-                        self.spawn_wave()
+            profiler = self.profiler
+            profiler.begin_frame()
+            with profiler.phase("events"):
+                events = pygame.event.get()
+            running = not any(event.type == pygame.QUIT for event in events)
+            loop.frame(events, pygame.key.get_pressed())
+            if recorder:
+                with profiler.phase("capture"):
+                    recorder.capture(self.screen)
+            profiler.end_frame(self)
+            clock.tick(self.config["render_fps"])
+
+        self.save_replay(record_path)
+        if profile_path:
+            self.profiler.dump_csv(profile_path)
+        if recorder:
+            recorder.close()
+            print(f"Captured {recorder.written} frames to {capture_path} ({recorder.dropped} dropped)")
+        pygame.quit()
 
-            self.draw()
-            clock.tick(60)
+    def save_replay(self, path):
+        if path and self.replay:
+            self.replay.save(path)
 
-        pygame.quit()
+    def interpolated_entities(self):
+        return [self.player]
+
+    def save_positions(self):
+        # Positions before a tick, used to interpolate the frames drawn between ticks
+        self.previous_positions = [(entity, entity.x, entity.y) for entity in self.interpolated_entities()]
+        # World entities' positions, sorted by entity id for lookups
+        archetypes = self.world.query("position")
+        if not archetypes:
+            self.previous_world = (np.zeros(0, np.int64), np.zeros(0), np.zeros(0))
+            return
+        entities = np.concatenate([archetype["entity"] for archetype in archetypes])
+        order = np.argsort(entities)
+        self.previous_world = tuple(np.concatenate([archetype[name] for archetype in archetypes])[order]
+                                    for name in ("entity", "x", "y"))
+
+    def step(self, inputs=0):
+        """Advance the simulation by one frame using an Input bitmask."""
+        if self.state != GameState.PLAYING:
+            return self.state
+
+        if self.replay is not None:
+            self.replay.record(inputs)
+        if inputs & Input.PAUSE:
+            self.paused = not self.paused
+        self.advanced = False
+        if self.paused or self.messages.tick():
+            return self.state
+
+        self.advanced = True
+        self.inputs = inputs
+        self.frame += 1
+        if inputs & Input.LEFT:
+            self.player.move(-self.player.speed)
+        if inputs & Input.RIGHT:
+            self.player.move(self.player.speed)
+        if inputs & Input.FIRE:
+            self.try_shoot()
+
+        profiler = self.profiler
+        with profiler.phase("player.update"):
+            self.player.update()
+        with profiler.phase("update_game_objects"):
+            self.update_game_objects()
+        with profiler.phase("handle_collisions"):
+            self.handle_collisions()
+
+        if not self.world.query("wave"):
+            self.wave += 1
+            if self.wave % 5 == 0:
+                self.spawn_bonus_wave()
+            else:
+                self.spawn_wave()
+
+        if self.rewind is not None and self.state == GameState.PLAYING:
+            with profiler.phase("rewind"):
+                self.rewind.push(self.save_state())
+        return self.state
+
+    def step_back(self):
+        """Restore the state from one tick earlier; returns False once the rewind history is used up."""
+        state = self.rewind.pop() if self.rewind is not None else None
+        if state is None:
+            return False
+        self.load_state(state)
+        self.advanced = False  # Velocities point forward in time, so rewound frames are not interpolated
+        return True
 
     def toggle_god_mode(self):
         self.god_mode = not self.god_mode
         if self.god_mode:
             self.player.shield_active = True  # Activate shield
             self.player.shield_time = float('inf')  # Make shield last indefinitely
-            self.show_message("GOD MODE ACTIVATED", 1000)
+            self.show_message("GOD MODE ACTIVATED", 1000, hold=False)
         else:
             self.player.shield_active = False  # Deactivate shield
             self.player.shield_time = 0  # Remove shield time
-            self.show_message("GOD MODE DEACTIVATED", 1000)
+            self.show_message("GOD MODE DEACTIVATED", 1000, hold=False)
 
     def jump_to_wave(self, wave):
         self.wave = wave
@@ -809,30 +2532,21 @@ class Game:
         self.player.y = self.player.ground_level - self.player.height
         self.player.health = self.player.max_health
 
-    def show_message(self, message, duration=2000):
-        message_text = self.font.render(message, True, WHITE)
-        self.screen.blit(message_text, (WIDTH // 2 - message_text.get_width() // 2, HEIGHT // 2 - message_text.get_height() // 2))
-        pygame.display.flip()
-        pygame.time.delay(duration)
+    def show_message(self, message, duration=2000, hold=True, then=None):
+        """Show a centered message for `duration` ms of game time without blocking the window."""
+        ticks = max(1, duration * self.config["fps"] // 1000)
+        self.messages.show(message, ticks, hold, then)
 
-    def start_game(self):
-        self.wave = 1
-        self.state = GameState.PLAYING
-        self.spawn_wave()
+    def end_game(self):
+        self.state = GameState.GAME_OVER
 
     def calculate_enemy_step_size(self):
         play_area_width = WIDTH - 60  # Subtracting 60 to give some margin
         self.enemy_step_size = play_area_width // 20
 
-    def increase_difficulty(self):
-        for enemy in self.enemies:
-            enemy.base_speed *= 1.1  # Increase base speed by 10% every wave
-        self.enemy_step_size *= 1.1  # Increase step size by 10% every wave
-
     def spawn_wave(self):
         self.clear_wave()
-        self.screen.fill(BLACK)
-        pygame.display.flip()
+        self.renderer.invalidate()
 
         if self.state == GameState.PLAYING:
             self.show_wave_indicator()
@@ -844,15 +2558,13 @@ class Game:
         else:
             self.spawn_regular_wave()
 
-        self.enemies_speed_increased = False
         self.state = GameState.PLAYING
 
     def clear_wave(self):
-        self.enemies = []
-        self.bullets = []
-        self.enemy_bullets = []
-        self.powerups = []
-        self.explosions = []
+        self.bullets.clear()
+        self.enemy_bullets.clear()
+        self.world.clear()
+        self.particles.clear()
 
     def spawn_regular_wave(self):
         enemy_width = 30
@@ -861,139 +2573,275 @@ class Game:
         group_spacing = 2 * enemy_width
         start_x = (WIDTH - (3 * group_width + 2 * group_spacing)) // 2
 
+        positions = []
         for group in range(3):
             for row in range(3):
                 for col in range(3):
                     x = start_x + group * (group_width + group_spacing) + col * (enemy_width + 10)
                     y = 50 + row * (enemy_height + 10)
-                    new_enemy = Enemy(x, y, self.wave, self)
-                    self.enemies.append(new_enemy)
+                    positions.append((x, y))
+
+        Formation.spawn(self, positions)
 
     def spawn_bonus_wave(self):
         self.bonus_wave = BonusWave(self)
+        self.bonus_wave.spawn_enemies()
 
     def spawn_boss_wave(self):
         self.clear_wave()
-        self.screen.fill(BLACK)
-        pygame.display.flip()
+        self.renderer.invalidate()
 
         if self.state == GameState.PLAYING:
             self.show_wave_indicator()
 
-        # Spawning boss enemy
-        self.boss = Boss(WIDTH // 2, 50, 100, self)
-        self.enemies.append(self.boss)
+        Boss.spawn(self.world, WIDTH // 2, 50)
 
-        self.enemies_speed_increased = False
         self.state = GameState.PLAYING
         
     def show_wave_indicator(self):
-        wave_text = self.font.render(f"Wave {self.wave}", True, WHITE)
-        self.screen.blit(wave_text, (WIDTH // 2 - wave_text.get_width() // 2, HEIGHT // 2 - wave_text.get_height() // 2))
-        pygame.display.flip()
-        pygame.time.delay(2000)
+        self.show_message(f"Wave {self.wave}")
+
+    def first_hit(self, candidates, destroyed, x0, y0, dx, dy, width, height):
+        # The entity a box moving from (x0, y0) by (dx, dy) this tick reaches first, or None
+        locations = self.world.locations
+        first, first_t = None, None
+        for entity in candidates:
+            if entity in destroyed or entity not in locations:
+                continue
+            archetype, row = locations[entity]
+            t = archetype.sweep(archetype, row, x0, y0, dx, dy, width, height)
+            if t is not None and (first_t is None or t < first_t):
+                first, first_t = entity, t
+        return first
 
     def handle_collisions(self):
-        for bullet in self.enemy_bullets[:]:
-            if (self.player.x < bullet.x < self.player.x + self.player.width and
-                self.player.y < bullet.y < self.player.y + self.player.height):
-                if not self.player.shield_active and self.player.respawn_shield_time <= 0:
-                    self.player.health -= 35
-                    self.enemy_bullets.remove(bullet)
-                    if self.player.health <= 0:
-                        self.player.lives -= 1
-                        self.player.health = 100
-                        if self.player.lives > 0:
-                            self.show_message("Life Lost!")
-                            self.player.respawn()
-                        else:
-                            self.show_message("Game Over!")
-                            self.state = GameState.GAME_OVER
+        tests = len(self.enemy_bullets)
+        hits = self.enemy_bullets.hitting(self.player)
+        for _ in range(int(np.count_nonzero(hits))):
+            if not self.player.shield_active and self.player.respawn_shield_time <= 0:
+                self.player.health -= 35
+                if self.player.health <= 0:
+                    self.player.lives -= 1
+                    self.player.health = 100
+                    if self.player.lives > 0:
+                        self.show_message("Life Lost!")
+                        self.player.respawn()
+                    else:
+                        self.show_message("Game Over!", then=self.end_game)
+        self.enemy_bullets.compact(~hits)
+
+        world = self.world
+        if self.bonus_wave:
+            flock_bullets = self.bonus_wave.flock_bullets
+            tests += len(flock_bullets)
+            hits = flock_bullets.hitting(self.player)
+            for _ in range(int(np.count_nonzero(hits))):
+                self.player.take_damage(35)  # Use the same damage as in other waves
+            flock_bullets.compact(~hits)
+        for entity, damage in ram_system(world, self.player):
+            self.player.take_damage(damage)
+            return_home(world, entity)
+
+        # Player bullets against every entity with health, via the broadphase grid
+        grid = self.collision_grid
+        grid.clear()
+        for archetype in world.query("position", "size", "health"):
+            for entity, x, y, width, height in zip(archetype["entity"].tolist(), archetype["x"].tolist(),
+                                                   archetype["y"].tolist(), archetype["width"].tolist(),
+                                                   archetype["height"].tolist()):
+                grid.insert(entity, x, y, width, height)
+
+        bullets = self.bullets
+        n = len(bullets)
+        keep = np.ones(n, dtype=bool)
+        destroyed = set()
+        for i in grid.candidates(bullets):
+            x0, y0, dx, dy, bw, bh = bullets.start(i)
+            candidates = grid.query_rect(min(x0, x0 + dx), min(y0, y0 + dy), bw + abs(dx), bh + abs(dy))
+            tests += len(candidates)
+            entity = self.first_hit(candidates, destroyed, x0, y0, dx, dy, bw, bh)
+            if entity is None:
+                continue
+            archetype, row = world.locations[entity]
+            if "armored" in archetype.components or not bullets.flags[i] & ProjectileStore.PENETRATING:
+                keep[i] = False
+            if "flinches" in archetype.components:
+                destroyed.add(entity)
+            health = archetype["health"]
+            health[row] -= 1
+            if health[row] <= 0:
+                destroyed.add(entity)
+                self.kill(entity)
+        bullets.compact(keep)
+        exposure_system(world)
+
+        # Pickups touching the player
+        tests += len(world)
+        self.profiler.add("collision_tests", tests)
+        for entity, effect in pickup_system(world, self.player):
+            self.collect(entity, effect)
+
+        for archetype in world.query("position", "size", "invader"):
+            if (archetype["y"] + archetype["height"] >= self.player.y).any():
+                self.show_message("Game Over!", then=self.end_game)
+
+    def kill(self, entity):
+        # Destroy an entity the player shot down, with its score, explosion and drop
+        world = self.world
+        archetype, row = world.locations[entity]
+        components = archetype.components
+        x, y, width, height = entity_box(archetype, row)
+        center_x, center_y = x + width // 2, y + height // 2
+        if "bounty" in components:
+            self.score += archetype["points"][row].item()
+        if "debris" in components:
+            for color, count, speed, life in World.EXPLOSIONS[archetype["explosion"][row]]:
+                self.particles.burst(center_x, center_y, color, count=count, speed=speed, life=life)
+        if "loot" in components:
+            chance, drop, drop_y = (archetype[name][row].item() for name in ("drop_chance", "drop", "drop_y"))
+            if chance >= 1 or self.rng.random() < chance:
+                if drop == ExtraLifePowerUp.EFFECT:
+                    ExtraLifePowerUp.spawn(world, center_x, y + height * drop_y)
                 else:
-                    self.enemy_bullets.remove(bullet)
-
-        for bullet in self.bullets[:]:
-            for enemy in self.enemies[:]:
-                if (enemy.x < bullet.x < enemy.x + enemy.width and
-                    enemy.y < bullet.y < enemy.y + enemy.height):
-                    self.enemies.remove(enemy)
-                    if not bullet.penetrating:
-                        self.bullets.remove(bullet)
-                    self.score += 10
-                    self.explosions.append(Explosion(enemy.x + enemy.width // 2, enemy.y + enemy.height // 2))
-                    if random.random() < 0.1:
-                        self.powerups.append(PowerUp(enemy.x + enemy.width // 2, enemy.y + enemy.height // 2))
-                    break
-
-        for powerup in self.powerups[:]:
-            if isinstance(powerup, PowerUp):
-                if (self.player.x < powerup.x < self.player.x + self.player.width and
-                    self.player.y < powerup.y < self.player.y + self.player.height):
-                    if powerup.type == "double_shoot":
-                        self.player.double_shoot = True
-                        self.player.double_shoot_time = self.power_up_durations["double_shoot"]
-                    elif powerup.type == "penetrating":
-                        self.player.penetrating_bullets = True
-                        self.player.penetrating_bullets_time = self.power_up_durations["penetrating"]
-                    elif powerup.type == "shield":
-                        self.player.activate_shield()
-                    self.powerups.remove(powerup)
-            elif isinstance(powerup, ExtraLifePowerUp):
-                if not powerup.collected and self.player.y < powerup.y + powerup.height and \
-                     self.player.x < powerup.x + self.player.width and \
-                     self.player.x + self.player.width > powerup.x:
-                    powerup.collected = True
-                    self.player.lives += 1
-
-        for enemy in self.enemies:
-            if enemy.y + enemy.height >= self.player.y:
-                self.show_message("Game Over!")
-                self.state = GameState.GAME_OVER
-
-        if self.special_enemy:
-            for bullet in self.bullets[:]:
-                if (self.special_enemy.x < bullet.x < self.special_enemy.x + self.special_enemy.width and
-                    self.special_enemy.y < bullet.y < self.special_enemy.y + self.special_enemy.height):
-                    if self.special_enemy.take_damage(10):
-                        self.score += 100
-                        self.explosions.append(Explosion(self.special_enemy.x + self.special_enemy.width // 2,
-                                                         self.special_enemy.y + self.special_enemy.height // 2))
-                        self.powerups.append(ExtraLifePowerUp(self.special_enemy.x + self.special_enemy.width // 2,
-                                                              self.special_enemy.y + self.special_enemy.height))
-                        self.special_enemy = None
-                    self.bullets.remove(bullet)
-                    break
+                    kind = PowerUp.TYPES[drop] if drop >= 0 else self.rng.choice(PowerUp.TYPES)
+                    PowerUp.spawn(world, center_x, y + height * drop_y, kind)
+        if "wreck" in components:
+            world.change(entity, add={"sprite": (archetype["wreck_sprite"][row].item(),)}, remove=("health", "wreck"))
+            return
+        world.destroy(entity)
+        for attached in world.query("attached"):
+            world.destroy_where(attached, attached["anchor"] == entity)
+
+    def collect(self, entity, effect):
+        player = self.player
+        if effect == ExtraLifePowerUp.EFFECT:
+            player.lives += 1
+            ExtraLifePowerUp.collect(self.world, entity)
+            return
+        kind = PowerUp.TYPES[effect]
+        if kind == "double_shoot":
+            player.double_shoot = True
+            player.double_shoot_time = self.power_up_durations["double_shoot"]
+        elif kind == "penetrating":
+            player.penetrating_bullets = True
+            player.penetrating_bullets_time = self.power_up_durations["penetrating"]
+        elif kind == "shield":
+            player.activate_shield()
+        self.world.destroy(entity)
+
+    def draw(self, alpha=1.0):
+        """Draw the current state; alpha < 1 blends positions toward the previous tick."""
+        if not self.advanced:
+            alpha = 1.0  # Nothing moved on the last tick (paused or held by a message), so draw it as it is
+        position = self.frame - 1 + alpha
+        if self.config["dirty_rects"]:
+            interval = self.config["starfield_dirty_interval"]
+            position = position // interval * interval if interval else 0
+        if self.starfield.scroll(position):
+            self.renderer.invalidate()  # A moving background repaints the whole screen
+        if alpha >= 1.0 or self.state != GameState.PLAYING:
+            self.draw_frame()
+            return
 
-    def draw(self):
-        self.screen.fill(BLACK)
+        # Temporarily move entities to their interpolated positions, then put them back
+        moved = []
+        for entity, x, y in self.previous_positions:
+            moved.append((entity, entity.x, entity.y))
+            entity.x = x + (entity.x - x) * alpha
+            entity.y = y + (entity.y - y) * alpha
+        stores = [self.bullets, self.enemy_bullets, self.particles]
+        if self.bonus_wave:
+            stores.append(self.bonus_wave.flock_bullets)
+        saved = []
+        for store in stores:
+            # Projectiles move linearly, so step them back along their velocity
+            x, y = store.x[:len(store)], store.y[:len(store)]
+            saved.append((x, y, x.copy(), y.copy()))
+            x -= store.dx[:len(store)] * (1.0 - alpha)
+            y -= store.dy[:len(store)] * (1.0 - alpha)
+        previous_entities, previous_x, previous_y = self.previous_world
+        if len(previous_entities):
+            for archetype in self.world.query("position"):
+                # World entities blend from their saved positions; ones added since the last tick stay put
+                x, y, entities = archetype["x"], archetype["y"], archetype["entity"]
+                index = np.minimum(np.searchsorted(previous_entities, entities), len(previous_entities) - 1)
+                seen = previous_entities[index] == entities
+                index = index[seen]
+                saved.append((x, y, x.copy(), y.copy()))
+                x[seen] = previous_x[index] + (x[seen] - previous_x[index]) * alpha
+                y[seen] = previous_y[index] + (y[seen] - previous_y[index]) * alpha
+        try:
+            self.draw_frame()
+        finally:
+            for entity, x, y in moved:
+                entity.x = x
+                entity.y = y
+            for x, y, saved_x, saved_y in saved:
+                x[:] = saved_x
+                y[:] = saved_y
+
+    def draw_frame(self):
+        if self.config["dirty_rects"] and self.state == GameState.PLAYING and not self.paused:
+            self.draw_dirty()
+            return
+        # Anything other than unpaused play repaints the whole screen
+        self.renderer.invalidate()
+        self.starfield.draw(self.screen)
         if self.state == GameState.MENU:
             self.draw_menu()
         elif self.state == GameState.PLAYING:
-            self.player.draw()
-            for bullet in self.bullets:
-                bullet.draw()
-            for enemy in self.enemies:
-                enemy.draw()
-            for bullet in self.enemy_bullets:
-                bullet.draw()
-            for powerup in self.powerups:
-                powerup.draw()
-            for explosion in self.explosions:
-                explosion.draw()
-            if self.special_enemy:
-                self.special_enemy.draw()
-            if hasattr(self, 'bonus_wave') and self.bonus_wave:
-                self.bonus_wave.draw()
+            self.draw_playfield()
             self.draw_hud()
+            self.draw_message()
             if self.paused:
                 self.draw_pause_screen()
         elif self.state == GameState.GAME_OVER:
             self.draw_game_over()
-        pygame.display.flip()
+        if self.show_profiler:
+            self.profiler.draw(self.screen)
+        self.present()
+
+    def draw_dirty(self):
+        renderer = self.renderer
+        renderer.begin(self.screen)
+        for rects in self.draw_playfield():
+            renderer.add(rects)
+        renderer.add(self.draw_hud())
+        renderer.add(self.draw_message())
+        if self.show_profiler:
+            renderer.add(self.profiler.draw(self.screen))
+        self.present(renderer.end(self.screen))
+
+    def present(self, dirty=None):
+        # Show the frame just drawn: the whole screen, or only the dirty rects
+        if isinstance(self.screen, RenderList):
+            self.screen.dirty = dirty  # Shown by the main thread once it has replayed the list
+        elif not self.headless:
+            with self.profiler.phase("display.flip"):
+                if dirty is None:
+                    pygame.display.flip()
+                else:
+                    pygame.display.update(dirty)
+
+    def draw_playfield(self):
+        # Draws every playfield entity and returns the rects each one covered
+        drawn = [self.player.draw(self.screen), self.bullets.draw(self.screen),
+                 render_system(self.world, self.screen), self.enemy_bullets.draw(self.screen),
+                 self.particles.draw(self.screen)]
+        if self.bonus_wave:
+            drawn.append(self.bonus_wave.draw(self.screen))
+        return drawn
+
+    def draw_message(self):
+        message = "<< Rewind" if self.rewinding else self.messages.current()
+        if message is None:
+            return None
+        text = self.hud.text(message)
+        return self.screen.blit(text, (WIDTH // 2 - text.get_width() // 2, HEIGHT // 2 - text.get_height() // 2))
 
     def draw_menu(self):
-        title = self.font.render("Space Shooter", True, WHITE)
-        start = self.font.render("Press SPACE to start", True, WHITE)
+        title = self.hud.text("Space Shooter")
+        start = self.hud.text("Press SPACE to start")
         self.screen.blit(title, (WIDTH // 2 - title.get_width() // 2, HEIGHT // 3))
         self.screen.blit(start, (WIDTH // 2 - start.get_width() // 2, HEIGHT // 2))
 
@@ -1018,61 +2866,7 @@ class Game:
         return icons
 
     def draw_hud(self):
-        score_text = self.font.render(f"Score: {self.score}", True, WHITE)
-        self.screen.blit(score_text, (10, 10))
-
-        wave_text = self.font.render(f"Wave: {self.wave}", True, WHITE)
-        self.screen.blit(wave_text, (WIDTH - wave_text.get_width() - 10, 10))
-
-        lives_icon = pygame.Surface((20, 20))
-        pygame.draw.rect(lives_icon, WHITE, (0, 10, 20, 10))
-        pygame.draw.polygon(lives_icon, WHITE, [(0, 10), (10, 0), (20, 10)])
-        lives_text = self.font.render(f"{self.player.lives} x", True, WHITE)
-        self.screen.blit(lives_text, (WIDTH - lives_text.get_width() - 35, HEIGHT - 30))
-        self.screen.blit(lives_icon, (WIDTH - 30, HEIGHT - 30))
-
-        health_bar_width = 200
-        health_bar_height = 20
-        health_bar_x = (WIDTH - health_bar_width) // 2
-        health_bar_y = 10
-        health_percentage = self.player.health / self.player.max_health
-        pygame.draw.rect(self.screen, HEALTH_RED, (health_bar_x, health_bar_y, health_bar_width, health_bar_height))
-        pygame.draw.rect(self.screen, HEALTH_GREEN, (health_bar_x, health_bar_y, int(health_bar_width * health_percentage), health_bar_height))
-
-        health_text = self.font.render("HEALTH", True, WHITE)
-        self.screen.blit(health_text, (health_bar_x + (health_bar_width - health_text.get_width()) // 2, health_bar_y + (health_bar_height - health_text.get_height()) // 2))
-
-        power_bar_width = 150
-        power_bar_height = 10
-        power_bar_x = 10
-        power_bar_y = HEIGHT - power_bar_height - 10
-        power_percentage = self.player.power / self.player.max_power
-        pygame.draw.rect(self.screen, POWER_RED, (power_bar_x, power_bar_y, power_bar_width, power_bar_height))
-        power_width = int(power_bar_width * power_percentage)
-        power_surface = pygame.Surface((power_width, power_bar_height))
-        for x in range(power_width):
-            color = pygame.Color(POWER_RED[0], POWER_RED[1], POWER_RED[2])
-            color.r = int(POWER_RED[0] + (POWER_YELLOW[0] - POWER_RED[0]) * (x / power_bar_width))
-            color.g = int(POWER_RED[1] + (POWER_YELLOW[1] - POWER_RED[1]) * (x / power_bar_width))
-            color.b = int(POWER_RED[2] + (POWER_YELLOW[2] - POWER_RED[2]) * (x / power_bar_width))
-            pygame.draw.line(power_surface, color, (x, 0), (x, power_bar_height))
-        self.screen.blit(power_surface, (power_bar_x, power_bar_y))
-
-        power_up_y = 90
-        for power_up, duration in [("shield", self.player.shield_time),
-                                   ("double_shoot", self.player.double_shoot_time),
-                                   ("penetrating", self.player.penetrating_bullets_time)]:
-            if duration > 0 and not math.isnan(duration):
-                icon = self.power_up_icons[power_up]
-                try:
-                    timer_text = f"{int(duration // 60):02d}s"
-                except ValueError:
-                    timer_text = "00s"
-                timer_surface = self.font.render(timer_text, True, WHITE)
-                total_width = timer_surface.get_width() + icon.get_width() + 5
-                self.screen.blit(timer_surface, (WIDTH - total_width - 10, power_up_y))
-                self.screen.blit(icon, (WIDTH - icon.get_width() - 10, power_up_y))
-                power_up_y += 30
+        return self.hud.draw(self.screen)
 
     def draw_power_up_timers(self):
         if self.player.shield_active:
@@ -1086,27 +2880,28 @@ class Game:
             self.screen.blit(penetrating_text, (WIDTH // 2 - penetrating_text.get_width() // 2, 70))
 
     def draw_game_over(self):
-        game_over = self.font.render("Game Over", True, WHITE)
-        score = self.font.render(f"Final Score: {self.score}", True, WHITE)
-        restart = self.font.render("Press R to restart", True, WHITE)
+        game_over = self.hud.text("Game Over")
+        score = self.hud.text(f"Final Score: {self.score}")
+        restart = self.hud.text("Press R to restart")
         self.screen.blit(game_over, (WIDTH // 2 - game_over.get_width() // 2, HEIGHT // 3))
         self.screen.blit(score, (WIDTH // 2 - score.get_width() // 2, HEIGHT // 2))
         self.screen.blit(restart, (WIDTH // 2 - restart.get_width() // 2, 2 * HEIGHT // 3))
 
     def draw_pause_screen(self):
-        pause_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        pause_surface.fill((0, 0, 0, 128))
-        self.screen.blit(pause_surface, (0, 0))
-        pause_text = self.font.render("PAUSED", True, WHITE)
+        if self.pause_overlay is None:
+            self.pause_overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+            self.pause_overlay.fill((0, 0, 0, 128))
+        self.screen.blit(self.pause_overlay, (0, 0))
+        pause_text = self.hud.text("PAUSED")
         self.screen.blit(pause_text, (WIDTH // 2 - pause_text.get_width() // 2, HEIGHT // 2 - pause_text.get_height() // 2))
 
     def try_shoot(self):
         if self.player.shoot():
             if self.player.double_shoot:
-                self.bullets.append(Bullet(self.player.x + 10, self.player.y, self.player.penetrating_bullets))
-                self.bullets.append(Bullet(self.player.x + self.player.width - 10, self.player.y, self.player.penetrating_bullets))
+                Bullet.spawn(self.bullets, self.player.x + 10, self.player.y, self.player.penetrating_bullets)
+                Bullet.spawn(self.bullets, self.player.x + self.player.width - 10, self.player.y, self.player.penetrating_bullets)
             else:
-                self.bullets.append(Bullet(self.player.x + self.player.width // 2, self.player.y, self.player.penetrating_bullets))
+                Bullet.spawn(self.bullets, self.player.x + self.player.width // 2, self.player.y, self.player.penetrating_bullets)
 
     def update_game_objects(self):
         if self.paused:
@@ -1114,122 +2909,112 @@ class Game:
 
         self.player.update()
 
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_SPACE]:
+        if self.inputs & Input.FIRE:
             self.try_shoot()
 
-        for bullet in self.bullets[:]:
-            bullet.move()
-            if bullet.y < 0:
-                self.bullets.remove(bullet)
-
-        move_group = False
-        if self.enemies:
-            rightmost_x = max(enemy.x for enemy in self.enemies)
-            leftmost_x = min(enemy.x for enemy in self.enemies)
-            lowest_y = max(enemy.y for enemy in self.enemies)
-
-            if len(self.enemies) == 1 and not self.enemies_speed_increased:
-                self.enemies[0].speed_multiplier = self.config["enemy_speed_multiplier_last"]
-                self.enemies_speed_increased = True
-            elif lowest_y >= HEIGHT - 4 * self.enemies[0].height and not self.enemies_speed_increased:
-                for enemy in self.enemies:
-                    enemy.speed_multiplier = self.config["enemy_speed_multiplier_group"]
-                self.enemies_speed_increased = True
-
-            if (rightmost_x + self.enemies[0].width >= WIDTH and self.enemies[0].direction == 1) or \
-               (leftmost_x <= 0 and self.enemies[0].direction == -1):
-                move_group = True
-
-            if move_group:
-                for enemy in self.enemies:
-                    enemy.direction *= -1
-                    enemy.y += enemy.height
-                    enemy.move_counter = 0
-            else:
-                for enemy in self.enemies:
-                    enemy.move()
-
-            if lowest_y + self.enemies[0].height >= self.player.y - self.enemies[0].height:
+        self.bullets.move()
+        self.bullets.cull(min_y=0)
+
+        world = self.world
+        invaders = world.query("position", "size", "invader")
+        if invaders:
+            # Invasion is checked against the extent from before this tick's step
+            invaded = any((archetype["y"] + archetype["height"] >= self.player.y - archetype["height"]).any()
+                          for archetype in invaders)
+            march_system(world, self.config)
+            if invaded:
                 self.player.lives -= 1
                 self.reset_wave()
                 if self.player.lives <= 0:
                     self.state = GameState.GAME_OVER
-        else:
-            if not hasattr(self, 'bonus_wave') or self.bonus_wave is None or self.bonus_wave.is_complete():
-                self.wave += 1
-                if self.wave % 5 == 0:
-                    self.spawn_bonus_wave()
-                else:
-                    self.spawn_wave()
-
-        for enemy in self.enemies:
-            if enemy.can_shoot() and len(self.enemy_bullets) < 3:
-                new_bullet = enemy.shoot()
-                if new_bullet:
-                    self.enemy_bullets.append(new_bullet)
-            if isinstance(enemy, FlyingFlockEnemy):
-                special_bullet = enemy.special_attack()
-                if special_bullet:
-                    self.enemy_bullets.append(special_bullet)
-
-        if self.wave % 5 != 0:
-            if self.special_enemy:
-                if not self.special_enemy.move():
-                    self.special_enemy = None
-                else:
-                    bullets = self.special_enemy.shoot()
-                    self.enemy_bullets.extend(bullets)
-            else:
-                self.special_enemy_timer += 1
-                if self.special_enemy_timer >= 900:
-                    self.special_enemy = SpecialEnemy(self)
-                    self.special_enemy_timer = 0
-
-        for bullet in self.enemy_bullets[:]:
-            bullet.move()
-            if bullet.y > HEIGHT:
-                self.enemy_bullets.remove(bullet)
-
-        for powerup in self.powerups[:]:
-            powerup.update()
-            if isinstance(powerup, ExtraLifePowerUp):
-                if powerup.lifetime <= 0 or powerup.collection_time > 60:
-                    self.powerups.remove(powerup)
-                elif not powerup.collected and self.player.y < powerup.y + powerup.height and \
-                     self.player.x < powerup.x + powerup.width and \
-                     self.player.x + self.player.width > powerup.x:
-                    powerup.collected = True
-                    self.player.lives += 1
+        elif not world.query("wave"):
+            self.wave += 1
+            if self.wave % 5 == 0:
+                self.spawn_bonus_wave()
             else:
-                if powerup.y > HEIGHT:
-                    self.powerups.remove(powerup)
-
-        for explosion in self.explosions[:]:
-            explosion.update()
-            if explosion.size > explosion.max_size:
-                self.explosions.remove(explosion)
-
-        if hasattr(self, 'bonus_wave') and self.bonus_wave:
-            self.bonus_wave.update()
-            self.bonus_wave.handle_collisions()  # Ensure handle_collisions is called
+                self.spawn_wave()
+
+        # Enemies, power-ups and the other component-built entities
+        if self.bonus_wave:
+            self.bonus_wave.launch()
+        movement_system(world)
+        bounce_system(world)
+        attachment_system(world)
+        patrol_system(world, self.rng)
+        dive_system(world, HEIGHT)
+        stores = (self.enemy_bullets, self.bonus_wave.flock_bullets if self.bonus_wave else None)
+        shooting_system(world, self.rng, self.player, stores)
+        # Diving enemies also drop bombs into the main enemy bullet store
+        shooting_system(world, self.rng, self.player, stores, "diving", store=self.enemy_bullets)
+
+        # The special enemy is the one patrolling entity
+        if self.wave % 5 != 0 and not world.query("patrol"):
+            self.special_enemy_timer += 1
+            if self.special_enemy_timer >= 900:
+                SpecialEnemy.spawn(world, self.rng)
+                self.special_enemy_timer = 0
+
+        self.enemy_bullets.move()
+        self.enemy_bullets.cull(max_y=HEIGHT)
+
+        landing_system(world)
+        lifetime_system(world)
+        cull_system(world, HEIGHT)
+
+        self.particles.update()
+
+        if self.bonus_wave:
+            with self.profiler.phase("bonus_wave.update"):
+                self.bonus_wave.update()
 
     def start_game(self):
+        # Only a game started fresh from its seed can be replayed
+        self.replay = Replay(self.seed) if self.frame == 0 else None
+        if self.rewind is not None:
+            self.rewind.clear()
         self.wave = 1
         self.state = GameState.PLAYING
         self.spawn_wave()
 
     def reset_wave(self):
         self.player.respawn()
-        self.enemies.clear()
         self.enemy_bullets.clear()
         self.bullets.clear()
-        self.powerups.clear()
-        self.enemies_speed_increased = False
+        self.world.clear()
         self.spawn_wave()
         print(f"Wave {self.wave} reset. Enemy speeds reset to normal.")
 
 if __name__ == "__main__":
-    game = Game()
-    game.run()
+    parser = argparse.ArgumentParser(description="Space Shooter")
+    parser.add_argument("--seed", type=int, help="seed for gameplay randomness")
+    parser.add_argument("--record", metavar="FILE", help="save the inputs of the last game played as a replay")
+    parser.add_argument("--replay", metavar="FILE", help="re-simulate a replay headless at full speed and print the result")
+    parser.add_argument("--profile-csv", metavar="FILE", help="write the frame profile ring buffer to a CSV file on exit")
+    parser.add_argument("--load-state", metavar="FILE", help="start from a save state instead of the menu")
+    parser.add_argument("--save-state", metavar="FILE", help="also write quick saves (F5) to this file")
+    parser.add_argument("--capture", metavar="PATH",
+                        help="record every displayed frame (or, with --replay, render the replay offline) "
+                             "as PNGs in the directory PATH, or as raw rgb24 video if PATH ends in .rgb or .raw")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="simulate and draw each frame on a second thread while the window shows the last one")
+    args = parser.parse_args()
+
+    if args.replay:
+        replay = Replay.load(args.replay)
+        start = time.perf_counter()
+        if args.capture:
+            recorder = FrameRecorder(args.capture)
+            game = replay.render(recorder)
+            recorder.close()
+        else:
+            game = replay.play()
+        elapsed = time.perf_counter() - start
+        print(f"Replayed {len(replay)} frames in {elapsed:.2f}s ({len(replay) / max(elapsed, 1e-9):.0f} frames/s): "
+              f"wave {game.wave}, score {game.score}, lives {game.player.lives}")
+    else:
+        game = Game(seed=args.seed, config={"pipeline": True} if args.pipeline else None)
+        if args.load_state:
+            game.load_state(SaveState.load(args.load_state, memory_map=True))
+        game.run(record_path=args.record, profile_path=args.profile_csv, state_path=args.save_state,
+                 capture_path=args.capture)
 
@@ -0,0 +1,214 @@
+"""Batch runner for balance sweeps: python batch_runner.py --games 500 --set enemy_base_speed=1,2"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import argparse
+import contextlib
+import importlib
+import io
+import itertools
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from SPACESHOOTER import Game, GameState, Input
+
+
+# Bot policies
+def idle_policy(game, rng):
+    return 0
+
+
+def random_policy(game, rng):
+    return rng.choice((0, Input.LEFT, Input.RIGHT)) | (Input.FIRE if rng.random() < 0.5 else 0)
+
+
+def targets(game):
+    # (x, width) of everything the player can shoot: every entity with health
+    return [box for archetype in game.world.query("position", "size", "health")
+            for box in zip(archetype["x"].tolist(), archetype["width"].tolist())]
+
+
+def tracker_policy(game, rng):
+    # Fire constantly and line up under the nearest target
+    inputs = Input.FIRE
+    player = game.player
+    center = player.x + player.width / 2
+    candidates = targets(game)
+    if candidates:
+        target_x = min((x + width / 2 for x, width in candidates), key=lambda x: abs(x - center))
+        if target_x > center + 5:
+            inputs |= Input.RIGHT
+        elif target_x < center - 5:
+            inputs |= Input.LEFT
+    return inputs
+
+
+def dodger_policy(game, rng):
+    # Track like tracker_policy, but step away from enemy bullets about to land on the player
+    player = game.player
+    x, y = game.enemy_bullets.x[:len(game.enemy_bullets)], game.enemy_bullets.y[:len(game.enemy_bullets)]
+    threat = (y > player.y - 120) & (y < player.y) & (x > player.x - 15) & (x < player.x + player.width + 15)
+    if threat.any():
+        center = player.x + player.width / 2
+        return Input.FIRE | (Input.LEFT if x[threat].mean() > center else Input.RIGHT)
+    return tracker_policy(game, rng)
+
+
+POLICIES = {
+    "idle": idle_policy,
+    "random": random_policy,
+    "tracker": tracker_policy,
+    "dodger": dodger_policy,
+}
+
+
+def load_policy(spec):
+    if spec in POLICIES:
+        return POLICIES[spec]
+    module_name, _, name = spec.partition(":")
+    if not name:
+        raise ValueError(f"unknown policy {spec!r}; use one of {sorted(POLICIES)} or module:function")
+    return getattr(importlib.import_module(module_name), name)
+
+
+# Running games
+def play_game(job):
+    """Play one headless game and return its metrics. Runs inside a worker process."""
+    config, seed, policy_spec, max_frames, start_wave = job
+    policy = load_policy(policy_spec)
+    rng = random.Random(seed)
+    # Wave resets print to stdout; keep thousands of games from flooding the console
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = Game(headless=True, seed=seed, config=config)
+        game.start_game()
+        if start_wave > 1:
+            game.wave = start_wave
+            game.spawn_wave()
+        lives = game.player.lives
+        lives_lost = 0
+        wave = game.wave
+        wave_start = 0
+        wave_frames = []
+        frame = 0
+        while frame < max_frames and game.state == GameState.PLAYING:
+            game.step(policy(game, rng))
+            frame += 1
+            if game.player.lives < lives:
+                lives_lost += lives - game.player.lives
+            lives = game.player.lives
+            if game.wave != wave:
+                wave_frames.append(frame - wave_start)
+                wave, wave_start = game.wave, frame
+    return {
+        "wave": game.wave,
+        "score": game.score,
+        "lives_lost": lives_lost,
+        "frames": frame,
+        "game_over": game.state == GameState.GAME_OVER,
+        "wave_seconds": [frames / game.config["fps"] for frames in wave_frames],
+    }
+
+
+def parse_setting(text):
+    # "name=1,2,3" -> ("name", [1, 2, 3]); values are JSON literals, anything else stays a string
+    name, sep, values = text.partition("=")
+    if not sep or not values:
+        raise argparse.ArgumentTypeError(f"expected name=value[,value...], got {text!r}")
+    parsed = []
+    for value in values.split(","):
+        try:
+            parsed.append(json.loads(value))
+        except ValueError:
+            parsed.append(value)
+    return name, parsed
+
+
+def config_grid(settings):
+    names = [name for name, values in settings]
+    return [dict(zip(names, combination)) for combination in itertools.product(*(values for name, values in settings))]
+
+
+def summarize(results):
+    waves = np.array([result["wave"] for result in results])
+    wave_seconds = [seconds for result in results for seconds in result["wave_seconds"]]
+    return {
+        "games": len(results),
+        "wave_mean": float(waves.mean()),
+        "wave_max": int(waves.max()),
+        "score_mean": float(np.mean([result["score"] for result in results])),
+        "lives_lost_mean": float(np.mean([result["lives_lost"] for result in results])),
+        "game_over_rate": float(np.mean([result["game_over"] for result in results])),
+        "seconds_per_wave": float(np.mean(wave_seconds)) if wave_seconds else None,
+        "frames": int(sum(result["frames"] for result in results)),
+    }
+
+
+def print_table(rows):
+    print(f"{'config':<48}{'games':>7}{'wave':>7}{'max':>5}{'score':>9}{'lost':>7}{'over%':>7}{'s/wave':>8}")
+    for config, summary in rows:
+        label = " ".join(f"{name}={value}" for name, value in config.items()) or "(defaults)"
+        seconds = summary["seconds_per_wave"]
+        print(f"{label:<48}{summary['games']:>7}{summary['wave_mean']:>7.2f}{summary['wave_max']:>5}"
+              f"{summary['score_mean']:>9.0f}{summary['lives_lost_mean']:>7.2f}{summary['game_over_rate'] * 100:>6.0f}%"
+              f"{seconds if seconds is not None else float('nan'):>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play headless Space Shooter games in parallel across a config grid")
+    parser.add_argument("--games", type=int, default=100, help="games per config")
+    parser.add_argument("--seed", type=int, default=0, help="first seed; every config plays seeds seed .. seed+games-1")
+    parser.add_argument("--policy", default="tracker",
+                        help=f"bot policy: one of {', '.join(sorted(POLICIES))} or module:function")
+    parser.add_argument("--set", dest="settings", metavar="NAME=V1,V2", action="append", type=parse_setting,
+                        default=[], help="Game.config values to sweep (repeatable; the grid is their product)")
+    parser.add_argument("--start-wave", type=int, default=1,
+                        help="wave every game starts at, e.g. 10 to sweep the boss fight")
+    parser.add_argument("--max-frames", type=int, default=60 * 60 * 10, help="frame limit per game")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--output", help="JSON file to write the summaries and per-game results to")
+    args = parser.parse_args()
+
+    load_policy(args.policy)
+    defaults = Game(headless=True).config
+    for name, values in args.settings:
+        if name not in defaults:
+            parser.error(f"unknown config key {name!r}")
+
+    configs = config_grid(args.settings)
+    jobs = [(config, args.seed + i, args.policy, args.max_frames, args.start_wave) for config in configs for i in range(args.games)]
+    # Big chunks keep pickling overhead low; several per worker keep the pool balanced at the tail
+    chunksize = max(1, len(jobs) // (args.workers * 8))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(play_game, jobs, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    rows = []
+    for index, config in enumerate(configs):
+        games = results[index * args.games:(index + 1) * args.games]
+        rows.append((config, summarize(games)))
+    print_table(rows)
+    frames = sum(result["frames"] for result in results)
+    print(f"{len(jobs)} games, {frames} frames in {elapsed:.1f}s on {args.workers} workers "
+          f"({frames / max(elapsed, 1e-9):.0f} frames/s)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "policy": args.policy,
+                "seed": args.seed,
+                "games": args.games,
+                "max_frames": args.max_frames,
+                "start_wave": args.start_wave,
+                "configs": [{"config": config, "summary": summary,
+                             "results": results[index * args.games:(index + 1) * args.games]}
+                            for index, (config, summary) in enumerate(rows)],
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
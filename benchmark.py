@@ -0,0 +1,234 @@
+"""Scenario benchmarks for Space Shooter: python benchmark.py --frames 1200 --output results.json"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pygame
+
+import SPACESHOOTER as game_module
+from SPACESHOOTER import WIDTH, HEIGHT, Game, GameState, Input, SpecialEnemy, Bullet, EnemyBullet
+
+PHASES = ("update_game_objects", "handle_collisions", "draw")
+PERCENTILES = (50, 90, 99)
+
+
+def make_game(seed):
+    # Headless so wave changes never block, but drawing to the dummy display surface
+    game = Game(headless=True, seed=seed)
+    game.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    game.start_game()
+    # Keep the player alive so every scenario runs for the full frame count
+    game.player.god_mode = True
+    game.player.activate_shield()
+    return game
+
+
+def bot_inputs(game, rng):
+    # Fire constantly and drift toward a random enemy, like a simple scripted player
+    targets = [x for archetype in game.world.query("position", "health") for x in archetype["x"].tolist()]
+    inputs = Input.FIRE
+    if targets:
+        target = targets[rng.randrange(len(targets))] if rng.random() < 0.05 else targets[0]
+        if target > game.player.x + 5:
+            inputs |= Input.RIGHT
+        elif target < game.player.x - 5:
+            inputs |= Input.LEFT
+    return inputs
+
+
+def setup_wave1(game):
+    pass
+
+
+def setup_bonus(game):
+    game.wave = 5
+    game.clear_wave()
+    game.spawn_bonus_wave()
+
+
+def setup_boss(game):
+    game.wave = 10
+    game.spawn_boss_wave()
+
+
+def setup_special(game):
+    SpecialEnemy.spawn(game.world, game.rng)
+
+
+def refill_special(game, rng):
+    if not game.world.query("patrol"):
+        SpecialEnemy.spawn(game.world, game.rng)
+
+
+def refill_bullets(game, rng, count=2000):
+    # Top both bullet stores back up to `count` projectiles spread over the playfield
+    for _ in range(count - len(game.bullets)):
+        Bullet.spawn(game.bullets, rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), rng.random() < 0.5)
+    for _ in range(count - len(game.enemy_bullets)):
+        EnemyBullet.spawn(game.enemy_bullets, rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT),
+                          rng.uniform(-1, 1), rng.uniform(1, 3))
+
+
+def refill_particles(game, rng, count=5000):
+    while len(game.particles) < count:
+        game.particles.burst(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), rng.choice(game.enemy_colors))
+
+
+# name -> (setup once, top-up before every frame or None)
+SCENARIOS = {
+    "wave1": (setup_wave1, None),
+    "bonus_wave": (setup_bonus, None),
+    "boss_wave": (setup_boss, None),
+    "special_enemy": (setup_special, refill_special),
+    "stress_bullets": (setup_wave1, refill_bullets),
+    "stress_particles": (setup_wave1, refill_particles),
+}
+
+
+def timed(method, samples):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter_ns() - start)
+    return wrapper
+
+
+def summarize(samples_ns):
+    ms = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    if not len(ms):
+        return {"mean_ms": 0.0, "max_ms": 0.0, **{f"p{p}_ms": 0.0 for p in PERCENTILES}}
+    summary = {"mean_ms": float(ms.mean()), "max_ms": float(ms.max())}
+    for p, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+        summary[f"p{p}_ms"] = float(value)
+    return summary
+
+
+def run_scenario(name, frames, seed):
+    setup, before_frame = SCENARIOS[name]
+    rng = random.Random(seed)
+    game = make_game(seed)
+    setup(game)
+
+    samples = {phase: [] for phase in PHASES}
+    # Instance attributes shadow the methods, so Game.step and the loop below call the timed versions
+    for phase in PHASES:
+        setattr(game, phase, timed(getattr(game, phase), samples[phase]))
+
+    frame_times = []
+    for _ in range(frames):
+        if game.state != GameState.PLAYING:
+            game.state = GameState.PLAYING
+            setup(game)
+        if before_frame:
+            before_frame(game, rng)
+        # Wave banners hold the simulation; skip them so every frame measures real work
+        game.messages.clear()
+        start = time.perf_counter_ns()
+        game.step(bot_inputs(game, rng))
+        game.draw()
+        frame_times.append(time.perf_counter_ns() - start)
+
+    total_s = sum(frame_times) / 1e9
+    return {
+        "frames": frames,
+        "fps": frames / total_s if total_s else 0.0,
+        "frame": summarize(frame_times),
+        "phases": {phase: summarize(samples[phase]) for phase in PHASES},
+        "final": {"wave": game.wave, "score": game.score},
+    }
+
+
+# Runs in a fresh interpreter so nothing is already imported or initialized
+STARTUP_PROBE = """
+import os, time, json
+start = time.perf_counter()
+import SPACESHOOTER
+imported = time.perf_counter()
+game = SPACESHOOTER.Game()
+constructed = time.perf_counter()
+game.open_window()
+opened = time.perf_counter()
+game.draw()
+drawn = time.perf_counter()
+print(json.dumps({"import": imported - start, "game": constructed - imported,
+                  "window": opened - constructed, "first_frame": drawn - opened, "total": drawn - start}))
+"""
+STARTUP_STEPS = ("import", "game", "window", "first_frame", "total")
+
+
+def measure_startup(runs):
+    samples = {step: [] for step in STARTUP_STEPS}
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="hide")
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_PROBE], env=env, check=True, capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        for step in STARTUP_STEPS:
+            samples[step].append(timings[step] * 1e9)
+    return {step: summarize(samples[step]) for step in STARTUP_STEPS}
+
+
+def print_table(results):
+    print(f"{'scenario':<20}{'fps':>10}" + "".join(f"{phase + ' p50/p99 ms':>34}" for phase in PHASES))
+    for name, result in results.items():
+        row = f"{name:<20}{result['fps']:>10.0f}"
+        for phase in PHASES:
+            stats = result["phases"][phase]
+            row += f"{stats['p50_ms']:>24.3f} / {stats['p99_ms']:<7.3f}"
+        print(row)
+
+
+def print_startup(startup):
+    print(f"{'startup step':<20}{'mean ms':>10}{'p50 ms':>10}{'max ms':>10}")
+    for step, stats in startup.items():
+        print(f"{step:<20}{stats['mean_ms']:>10.1f}{stats['p50_ms']:>10.1f}{stats['max_ms']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Space Shooter update and draw throughput")
+    parser.add_argument("--frames", type=int, default=600, help="frames to run per scenario")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the games and the scripted bot")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable, default: all)")
+    parser.add_argument("--startup", type=int, default=0, metavar="RUNS",
+                        help="measure cold startup over RUNS fresh interpreters instead of the scenarios")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file to write results to")
+    args = parser.parse_args()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+        "module": os.path.basename(game_module.__file__),
+    }
+    if args.startup:
+        report["runs"] = args.startup
+        report["startup"] = measure_startup(args.startup)
+    else:
+        game_module.init_pygame()
+        report["frames"] = args.frames
+        report["seed"] = args.seed
+        report["scenarios"] = {name: run_scenario(name, args.frames, args.seed) for name in args.scenario or SCENARIOS}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.startup:
+        print_startup(report["startup"])
+    else:
+        print_table(report["scenarios"])
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
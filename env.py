@@ -0,0 +1,280 @@
+"""Gym-style environments for training agents: SpaceShooterEnv, and VectorEnv to run many across processes."""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "hide")
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+import pygame
+
+from SPACESHOOTER import WIDTH, HEIGHT, Game, GameState, Input, PowerUp
+
+
+# Single environment
+class SpaceShooterEnv:
+    ACTIONS = (0, Input.LEFT, Input.RIGHT, Input.FIRE, Input.LEFT | Input.FIRE, Input.RIGHT | Input.FIRE)
+
+    # Feature layout: the player, then fixed-size tables of the nearest entities,
+    # nearest first and zero-padded; the first column of every row is 1 when the row is present
+    PLAYER_FEATURES = 9
+    MAX_ENEMIES = 16
+    ENEMY_FEATURES = 5  # present, x, y, width, height
+    MAX_BULLETS = 32
+    BULLET_FEATURES = 5  # present, x, y, dx, dy
+    MAX_POWERUPS = 4
+    POWERUP_FEATURES = 3 + len(PowerUp.TYPES) + 1  # present, x, y, one-hot effect (the power-up types, then extra life)
+    FEATURES = (PLAYER_FEATURES + MAX_ENEMIES * ENEMY_FEATURES + MAX_BULLETS * BULLET_FEATURES
+                + MAX_POWERUPS * POWERUP_FEATURES)
+    SPEED_SCALE = 10.0  # Projectile velocities are divided by this to keep features near [-1, 1]
+
+    def __init__(self, observation="features", frame_scale=4, config=None):
+        if observation not in ("features", "frame"):
+            raise ValueError(f"unknown observation mode {observation!r}; use 'features' or 'frame'")
+        self.observation = observation
+        self.frame_scale = frame_scale
+        self.config = config
+        self.game = None
+        if observation == "features":
+            self.observation_shape = (self.FEATURES,)
+            self.observation_dtype = np.float32
+        else:
+            self.observation_shape = (len(range(0, HEIGHT, frame_scale)), len(range(0, WIDTH, frame_scale)), 3)
+            self.observation_dtype = np.uint8
+
+    def reset(self, seed=None, out=None):
+        self.game = Game(headless=True, seed=seed, config=self.config)
+        self.game.start_game()
+        return self.observe(out)
+
+    def step(self, action, out=None):
+        """Advance one tick; returns (observation, reward, done, info)."""
+        game = self.game
+        score = game.score
+        done = game.step(self.ACTIONS[action]) == GameState.GAME_OVER
+        info = {"score": game.score, "wave": game.wave, "lives": game.player.lives, "frame": game.frame}
+        return self.observe(out), float(game.score - score), done, info
+
+    def observe(self, out=None):
+        """Write the current observation into out (allocated when None) and return it."""
+        if out is None:
+            out = np.empty(self.observation_shape, self.observation_dtype)
+        if self.observation == "features":
+            self.features(out)
+        else:
+            self.frame(out)
+        return out
+
+    def frame(self, out):
+        self.game.draw()
+        # pixels3d is a view of the surface itself; the strided slice picks every frame_scale-th pixel
+        # from it and only those are copied into out. The view locks the surface, so it must not outlive this call.
+        pixels = pygame.surfarray.pixels3d(self.game.screen)
+        try:
+            np.copyto(out, pixels[::self.frame_scale, ::self.frame_scale].transpose(1, 0, 2))
+        finally:
+            del pixels
+
+    def features(self, out):
+        game = self.game
+        player = game.player
+        out[:] = 0
+        out[:self.PLAYER_FEATURES] = (
+            player.x / WIDTH,
+            player.y / HEIGHT,
+            player.lives / game.config["player_lives"],
+            player.power / player.max_power,
+            player.can_shoot(),
+            player.double_shoot,
+            player.penetrating_bullets,
+            player.shield_active,
+            player.respawn_shield_time > 0,
+        )
+        center_x = player.x + player.width / 2
+        center_y = player.y + player.height / 2
+        offset = self.PLAYER_FEATURES
+
+        # Enemies: every entity the player can shoot, i.e. everything with health
+        archetypes = game.world.query("position", "size", "health")
+        table = out[offset:offset + self.MAX_ENEMIES * self.ENEMY_FEATURES].reshape(self.MAX_ENEMIES, -1)
+        if archetypes:
+            boxes = np.concatenate([np.column_stack((archetype["x"], archetype["y"], archetype["width"],
+                                                     archetype["height"])) for archetype in archetypes])
+            rows = nearest(boxes[:, 0] + boxes[:, 2] / 2, boxes[:, 1] + boxes[:, 3] / 2,
+                           center_x, center_y, self.MAX_ENEMIES)
+            boxes = boxes[rows]
+            table[:len(rows), 0] = 1
+            table[:len(rows), 1:] = boxes / (WIDTH, HEIGHT, WIDTH, HEIGHT)
+        offset += self.MAX_ENEMIES * self.ENEMY_FEATURES
+
+        # Enemy bullets, including the flock's
+        stores = [game.enemy_bullets]
+        if game.bonus_wave:
+            stores.append(game.bonus_wave.flock_bullets)
+        x = np.concatenate([store.x[:len(store)] for store in stores])
+        table = out[offset:offset + self.MAX_BULLETS * self.BULLET_FEATURES].reshape(self.MAX_BULLETS, -1)
+        if len(x):
+            y = np.concatenate([store.y[:len(store)] for store in stores])
+            rows = nearest(x, y, center_x, center_y, self.MAX_BULLETS)
+            dx = np.concatenate([store.dx[:len(store)] for store in stores])
+            dy = np.concatenate([store.dy[:len(store)] for store in stores])
+            table[:len(rows), 0] = 1
+            table[:len(rows), 1] = x[rows] / WIDTH
+            table[:len(rows), 2] = y[rows] / HEIGHT
+            table[:len(rows), 3] = dx[rows] / self.SPEED_SCALE
+            table[:len(rows), 4] = dy[rows] / self.SPEED_SCALE
+        offset += self.MAX_BULLETS * self.BULLET_FEATURES
+
+        # Power-ups, with their effect one-hot encoded
+        table = out[offset:offset + self.MAX_POWERUPS * self.POWERUP_FEATURES].reshape(self.MAX_POWERUPS, -1)
+        pickups = game.world.query("position", "size", "pickup")
+        if pickups:
+            x, y, width, height, effect = (np.concatenate([archetype[name] for archetype in pickups])
+                                           for name in ("x", "y", "width", "height", "effect"))
+            rows = nearest(x + width / 2, y + height / 2, center_x, center_y, self.MAX_POWERUPS)
+            table[:len(rows), 0] = 1
+            table[:len(rows), 1] = x[rows] / WIDTH
+            table[:len(rows), 2] = y[rows] / HEIGHT
+            table[np.arange(len(rows)), 3 + effect[rows]] = 1
+
+
+def nearest(x, y, center_x, center_y, count):
+    # Indices of the `count` points closest to the center, nearest first
+    distance = (x - center_x) ** 2 + (y - center_y) ** 2
+    if len(distance) > count:
+        rows = np.argpartition(distance, count)[:count]
+        return rows[np.argsort(distance[rows], kind="stable")]
+    return np.argsort(distance, kind="stable")
+
+
+# Vectorized environments
+def worker(connection, names, shape, dtype, total, envs, first, env_kwargs):
+    """Step envs[first:first + len] in a worker process, reading and writing the shared buffers."""
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    try:
+        observations = np.ndarray((total, *shape), dtype, buffer=blocks[0].buf)
+        actions = np.ndarray((total,), np.int64, buffer=blocks[1].buf)
+        rewards = np.ndarray((total,), np.float32, buffer=blocks[2].buf)
+        dones = np.ndarray((total,), np.bool_, buffer=blocks[3].buf)
+        local = [SpaceShooterEnv(**env_kwargs) for _ in range(envs)]
+        indices = range(first, first + envs)
+        seeds = [None] * envs
+        while True:
+            command, argument = connection.recv()
+            if command == "reset":
+                seeds = list(argument)
+                for env, index, seed in zip(local, indices, seeds):
+                    env.reset(seed, out=observations[index])
+                connection.send(None)
+            elif command == "step":
+                infos = []
+                for slot, (env, index) in enumerate(zip(local, indices)):
+                    _, reward, done, info = env.step(actions[index], out=observations[index])
+                    rewards[index] = reward
+                    dones[index] = done
+                    if done:
+                        # Start the next episode at once; its first observation replaces the final one
+                        if seeds[slot] is not None:
+                            seeds[slot] += total
+                        env.reset(seeds[slot], out=observations[index])
+                    infos.append(info)
+                connection.send(infos)
+            elif command == "close":
+                break
+        # Drop the views before the blocks are closed
+        del observations, actions, rewards, dones
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for block in blocks:
+            block.close()
+        connection.close()
+
+
+class VectorEnv:
+    """num_envs SpaceShooterEnvs across worker processes; returned arrays are shared and overwritten by the next step."""
+
+    def __init__(self, num_envs, workers=None, observation="features", frame_scale=4, config=None):
+        self.num_envs = num_envs
+        workers = min(num_envs, workers or os.cpu_count())
+        probe = SpaceShooterEnv(observation, frame_scale, config)
+        self.observation_shape = probe.observation_shape
+        self.observation_dtype = probe.observation_dtype
+        self.action_count = len(probe.ACTIONS)
+
+        layouts = [((num_envs, *self.observation_shape), self.observation_dtype),
+                   ((num_envs,), np.int64), ((num_envs,), np.float32), ((num_envs,), np.bool_)]
+        self.blocks = [shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+                       for shape, dtype in layouts]
+        self.observations, self.actions, self.rewards, self.dones = (
+            np.ndarray(shape, dtype, buffer=block.buf) for (shape, dtype), block in zip(layouts, self.blocks))
+
+        env_kwargs = {"observation": observation, "frame_scale": frame_scale, "config": config}
+        names = [block.name for block in self.blocks]
+        self.connections = []
+        self.processes = []
+        self.slices = []
+        first = 0
+        for index in range(workers):
+            envs = num_envs // workers + (index < num_envs % workers)
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=worker, args=(child, names, self.observation_shape, self.observation_dtype, num_envs, envs, first,
+                      env_kwargs),
+                daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+            self.slices.append((first, first + envs))
+            first += envs
+        self.closed = False
+
+    def reset(self, seed=None):
+        """Start every env; env i plays seed + i, or a random seed when seed is None."""
+        for connection, (start, stop) in zip(self.connections, self.slices):
+            seeds = [None if seed is None else seed + i for i in range(start, stop)]
+            connection.send(("reset", seeds))
+        for connection in self.connections:
+            connection.recv()
+        return self.observations
+
+    def step(self, actions):
+        """Step every env with its action; returns (observations, rewards, dones, infos)."""
+        self.actions[:] = actions
+        for connection in self.connections:
+            connection.send(("step", None))
+        infos = []
+        for connection in self.connections:
+            infos.extend(connection.recv())
+        return self.observations, self.rewards, self.dones, infos
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for connection in self.connections:
+            try:
+                connection.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for connection in self.connections:
+            connection.close()
+        del self.observations, self.actions, self.rewards, self.dones
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        if not getattr(self, "closed", True):
+            self.close()